@@ -0,0 +1,149 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+
+class ApiTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Фёдор')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-slug', description='-')
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {number}')
+            for number in range(25)
+        ]
+        Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, params=None, **kwargs):
+        response = self.client.get(reverse(f'api:{name}', kwargs=kwargs),
+                                   params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response, response.json()
+
+    def test_posts_cursor_pagination(self):
+        """Посты листаются курсором без повторов и пропусков."""
+        response, data = self.get('posts')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(data['results']), 20)
+        self.assertEqual(data['results'][0]['text'], 'Пост 24')
+        self.assertIsNone(data['previous'])
+        response = self.client.get(data['next'])
+        rest = response.json()['results']
+        self.assertEqual([post['text'] for post in rest],
+                         [f'Пост {number}' for number in range(4, -1, -1)])
+
+    def test_sparse_fieldsets_narrow_select(self):
+        """?fields= оставляет в ответе и в SELECT только нужные поля."""
+        with CaptureQueriesContext(connection) as queries:
+            _, data = self.get('posts', {'fields': 'id,author'})
+        self.assertEqual(set(data['results'][0]), {'id', 'author'})
+        self.assertEqual(data['results'][0]['author'], 'author')
+        select = queries[-1]['sql']
+        self.assertNotIn('"text"', select)
+        self.assertIn('"username"', select)
+        self.assertIn('fields=id%2Cauthor', data['next'])
+
+    def test_unknown_field_is_bad_request(self):
+        """Неизвестное поле — 400 со списком доступных."""
+        response, data = self.get('posts', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', data['detail'])
+
+    def test_resources(self):
+        """Пост, комментарии, группы и профиль отдаются как JSON."""
+        post = self.posts[0]
+        _, data = self.get('post', post_id=post.id)
+        self.assertEqual(data['group'], 'api-slug')
+        _, data = self.get('comments', post_id=post.id)
+        self.assertEqual(data['results'][0]['author'], 'reader')
+        _, data = self.get('groups', {'fields': 'slug'})
+        self.assertEqual(data['results'], [{'slug': 'api-slug'}])
+        _, data = self.get('group_posts', slug='api-slug')
+        self.assertEqual(len(data['results']), 20)
+        _, data = self.get('profile', username='author')
+        self.assertEqual(data['posts_count'], 25)
+        self.assertEqual(data['followers_count'], 1)
+        _, data = self.get('profile_posts', username='author')
+        self.assertEqual(data['results'][0]['author'], 'author')
+
+    def test_missing_objects_not_found(self):
+        """Отсутствующие объекты — 404 в JSON."""
+        for name, kwargs in (('post', {'post_id': 0}),
+                             ('comments', {'post_id': 0}),
+                             ('group_posts', {'slug': 'missing'}),
+                             ('profile', {'username': 'missing'}),
+                             ('profile_posts', {'username': 'missing'})):
+            with self.subTest(name=name):
+                response, data = self.get(name, **kwargs)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', data)
+
+    def test_follow_feed_requires_login(self):
+        """Лента подписок — только для вошедших."""
+        response, _ = self.get('follow')
+        self.assertEqual(response.status_code, 401)
+        self.client.force_login(self.reader)
+        response, data = self.get('follow', {'fields': 'id,text'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['results'][0], {
+            'id': self.posts[-1].id, 'text': 'Пост 24'})
+
+    def test_comments_count_only_on_post(self):
+        """Счётчик комментариев свежий у поста и не отдаётся списками."""
+        post = self.posts[-1]
+        self.get('post', post_id=post.id)
+        Comment.objects.create(post=post, author=self.reader, text='Ещё')
+        _, data = self.get('post', {'fields': 'comments_count'},
+                           post_id=post.id)
+        self.assertEqual(data, {'comments_count': 1})
+        for name, kwargs in (('posts', {}),
+                             ('group_posts', {'slug': 'api-slug'}),
+                             ('profile_posts', {'username': 'author'})):
+            with self.subTest(name=name):
+                response, data = self.get(
+                    name, {'fields': 'id,comments_count'}, **kwargs)
+                self.assertEqual(response.status_code, 400)
+                _, data = self.get(name, **kwargs)
+                self.assertNotIn('comments_count', data['results'][0])
+
+    @override_settings(FEED_MODE='pull')
+    def test_merged_follow_feed_serializes_models(self):
+        """Слияние потоков отдаёт модели: картинка — имя файла."""
+        self.client.force_login(self.reader)
+        response, data = self.get('follow', {'fields': 'id,image,author'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['results'][0], {
+            'id': self.posts[-1].id, 'image': '', 'author': 'author'})
+
+    def test_cached_page_answers_conditional_get(self):
+        """Списки кэшируются и отвечают 304 на совпавший ETag."""
+        url = reverse('api:posts')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_read_only(self):
+        """Изменяющие методы не поддерживаются."""
+        response = self.client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
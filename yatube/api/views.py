@@ -0,0 +1,230 @@
+'''JSON API только для чтения.
+
+Ответ строится из values(): модели не создаются, а ?fields= сужает
+SELECT до запрошенных колонок. Списки листаются курсором, как
+HTML-страницы, и кэшируются под теми же поколениями.
+'''
+from functools import wraps
+
+from django.db.models.fields.files import FieldFile
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_safe
+
+from posts.caching import (cache_page_by, condition_by, group_scopes,
+                           index_scopes, page_state, post_scopes,
+                           profile_scopes)
+from posts.feed import (FEED_ORDERING, FeedPaginator, feed_paginator,
+                        feed_posts)
+from posts.models import Comment, Group, Post, User
+from posts.paginators import (COMMENT_ORDERING, CURSOR_PARAM, POST_ORDERING,
+                              CursorPaginator, InvalidCursor)
+from yatube.settings import API_PAGE_SIZE, PAGE_CACHE_TIMEOUT
+
+FIELDS_PARAM = 'fields'
+GROUP_ORDERING = ('id',)
+
+# Имя поля в ответе → путь для values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+# Списки кэшируются под областями index, group и author, а комментарии
+# сдвигают только post:<id>: счётчик в списке устаревал бы. Он есть
+# только у отдельного поста.
+POST_LIST_FIELDS = {
+    name: path for name, path in POST_FIELDS.items()
+    if name != 'comments_count'
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+PROFILE_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}
+
+
+class ApiError(Exception):
+    status = 400
+
+
+class NotAuthenticated(ApiError):
+    status = 401
+
+
+def api_view(view):
+    '''Только GET и HEAD; ошибки — JSON с полем detail.'''
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'detail': str(error)}, status=error.status)
+        except Http404:
+            return JsonResponse({'detail': 'Не найдено.'}, status=404)
+    return wrapper
+
+
+def respond(data):
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+def selected(request, fields):
+    '''Поля из ?fields= в порядке запроса; без параметра — все.'''
+    raw = request.GET.get(FIELDS_PARAM)
+    if not raw:
+        return list(fields)
+    names = [name for name in raw.split(',') if name]
+    unknown = [name for name in names if name not in fields]
+    if unknown or not names:
+        raise ApiError(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(fields)}.')
+    return names
+
+
+def resolve(item, path):
+    '''Значение пути values() у словаря или у объекта модели.'''
+    if isinstance(item, dict):
+        return item[path]
+    for part in path.split('__'):
+        item = getattr(item, part)
+        if item is None:
+            return None
+    if isinstance(item, FieldFile):
+        # values() отдаёт имя файла; у модели должно быть так же.
+        return item.name
+    return item
+
+
+def serialize(item, names, fields):
+    return {name: resolve(item, fields[name]) for name in names}
+
+
+def link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params[CURSOR_PARAM] = cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+def page(request, queryset, fields, ordering, paginator=None,
+         paginator_class=CursorPaginator, **options):
+    '''Страница списка: в SELECT только поля ответа и ключ курсора.'''
+    names = selected(request, fields)
+    if paginator is None:
+        paths = {fields[name] for name in names}
+        paths.update(name.lstrip('-') for name in ordering)
+        paginator = paginator_class(queryset.values(*paths), API_PAGE_SIZE,
+                                    ordering=ordering, **options)
+    try:
+        current = paginator.page(request.GET.get(CURSOR_PARAM))
+    except InvalidCursor:
+        raise ApiError('Неверный курсор.')
+    return respond({
+        'results': [serialize(item, names, fields) for item in current],
+        'next': link(request, current.next_cursor),
+        'previous': link(request, current.previous_cursor),
+    })
+
+
+def require(request, scopes, **kwargs):
+    '''404, если области не нашлись; их запрос уже сделал кэш страницы.'''
+    if page_state(request, scopes, kwargs) is None:
+        raise Http404
+
+
+def detail(request, queryset, fields):
+    names = selected(request, fields)
+    item = queryset.values(*{fields[name] for name in names}).first()
+    if item is None:
+        raise Http404
+    return respond(serialize(item, names, fields))
+
+
+@api_view
+@condition_by(index_scopes, per_user=False)
+@cache_page_by(PAGE_CACHE_TIMEOUT, index_scopes, per_user=False)
+def posts(request):
+    return page(request, Post.objects.all(), POST_LIST_FIELDS,
+                POST_ORDERING)
+
+
+@api_view
+@condition_by(post_scopes, per_user=False)
+@cache_page_by(PAGE_CACHE_TIMEOUT, post_scopes, per_user=False)
+def post(request, post_id):
+    return detail(request, Post.objects.filter(pk=post_id), POST_FIELDS)
+
+
+@api_view
+@condition_by(post_scopes, per_user=False)
+@cache_page_by(PAGE_CACHE_TIMEOUT, post_scopes, per_user=False)
+def comments(request, post_id):
+    require(request, post_scopes, post_id=post_id)
+    return page(request, Comment.objects.filter(post_id=post_id),
+                COMMENT_FIELDS, COMMENT_ORDERING)
+
+
+@api_view
+def groups(request):
+    return page(request, Group.objects.all(), GROUP_FIELDS, GROUP_ORDERING)
+
+
+@api_view
+@condition_by(group_scopes, per_user=False)
+@cache_page_by(PAGE_CACHE_TIMEOUT, group_scopes, per_user=False)
+def group_posts(request, slug):
+    require(request, group_scopes, slug=slug)
+    return page(request, Post.objects.filter(group__slug=slug),
+                POST_LIST_FIELDS, POST_ORDERING)
+
+
+@api_view
+def profile(request, username):
+    return detail(request, User.objects.filter(username=username),
+                  PROFILE_FIELDS)
+
+
+@api_view
+@condition_by(profile_scopes, per_user=False)
+@cache_page_by(PAGE_CACHE_TIMEOUT, profile_scopes, per_user=False)
+def profile_posts(request, username):
+    require(request, profile_scopes, username=username)
+    return page(request, Post.objects.filter(author__username=username),
+                POST_LIST_FIELDS, POST_ORDERING)
+
+
+@api_view
+def follow(request):
+    '''Лента подписок; слияние потоков отдаёт модели, а не словари.'''
+    if not request.user.is_authenticated:
+        raise NotAuthenticated('Требуется вход.')
+    merged = feed_paginator(request.user, API_PAGE_SIZE)
+    if merged is not None:
+        return page(request, None, POST_LIST_FIELDS, POST_ORDERING,
+                    merged)
+    return page(request, feed_posts(request.user), POST_LIST_FIELDS,
+                FEED_ORDERING, paginator_class=FeedPaginator,
+                user_id=request.user.pk)
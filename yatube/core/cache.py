@@ -0,0 +1,209 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+'''
+ALIVE = '(expires IS NULL OR expires > ?)'
+# Диапазон INTEGER в SQLite; большие целые sqlite3 не передаст.
+INTEGER_MIN = -2 ** 63
+INTEGER_MAX = 2 ** 63 - 1
+
+
+class SQLiteCache(BaseCache):
+    '''Кэш в файле SQLite (WAL), общий для всех процессов узла.
+
+    Целые числа в диапазоне INTEGER хранятся как есть, остальные
+    значения, включая большие целые, сериализуются pickle; incr
+    атомарен за счёт BEGIN IMMEDIATE. Вытеснение — по
+    давности обращения (LRU), время обращения обновляется не чаще раза
+    в LRU_RESOLUTION секунд, чтобы чтения не превращались в записи.
+    '''
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._lru_resolution = options.get('LRU_RESOLUTION', 10)
+        self._cull_every = options.get('CULL_EVERY', 1000)
+        self._writes = 0
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            # После fork соединение родителя использовать нельзя.
+            local.db = sqlite3.connect(self._path,
+                                       timeout=self._busy_timeout,
+                                       isolation_level=None)
+            local.db.execute('PRAGMA journal_mode=WAL')
+            local.db.execute('PRAGMA synchronous=NORMAL')
+            local.db.executescript(SCHEMA)
+            local.pid = os.getpid()
+        return local.db
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int and INTEGER_MIN <= value <= INTEGER_MAX:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _fetch(self, keys):
+        now = time.time()
+        found = {}
+        stale = []
+        # Ограничение SQLite на число параметров запроса.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._db.execute(
+                'SELECT key, value, accessed FROM cache WHERE key IN (%s) '
+                'AND %s' % (','.join('?' * len(chunk)), ALIVE),
+                [*chunk, now])
+            for key, value, accessed in rows:
+                found[key] = self._load(value)
+                if accessed < now - self._lru_resolution:
+                    stale.append(key)
+        if stale:
+            self._db.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                [(now, key) for key in stale])
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._fetch(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def _rows(self, data, timeout):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        return [(key, self._dump(value), expires, now)
+                for key, value in data]
+
+    def _write(self, sql, rows):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = db.executemany(sql, rows)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._writes += len(rows)
+        if self._writes >= self._cull_every:
+            self._writes = 0
+            self._cull()
+        return cursor.rowcount
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                    self._rows([(self._key(key, version), value)], timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = [(self._key(key, version), value)
+                for key, value in data.items()]
+        if rows:
+            self._write('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                        self._rows(rows, timeout))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        row = self._rows([(self._key(key, version), value)], timeout)[0]
+        changed = self._write(
+            'INSERT INTO cache VALUES (?, ?, ?, ?) ON CONFLICT(key) DO '
+            'UPDATE SET value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            [(*row, row[3])])
+        return changed > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        changed = self._write(
+            'UPDATE cache SET expires = ? WHERE key = ? AND ' + ALIVE,
+            [(expires, self._key(key, version), time.time())])
+        return changed > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            # Сумма считается в Python: SQLite молча превратил бы
+            # переполнение INTEGER в REAL.
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? AND ' + ALIVE,
+                (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = self._load(row[0]) + delta
+            db.execute('UPDATE cache SET value = ? WHERE key = ?',
+                       (self._dump(value), key))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? AND ' + ALIVE,
+            (key, time.time())).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self._write('DELETE FROM cache WHERE key = ?',
+                    [(self._key(key, version),)])
+
+    def delete_many(self, keys, version=None):
+        rows = [(self._key(key, version),) for key in keys]
+        if rows:
+            self._write('DELETE FROM cache WHERE key = ?', rows)
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _cull(self):
+        db = self._db
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            excess = count - self._max_entries
+            if self._cull_frequency:
+                excess = max(excess, count // self._cull_frequency)
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)', (excess,))
+
+    def close(self, **kwargs):
+        # Соединение живёт в потоке между запросами.
+        pass
@@ -0,0 +1,87 @@
+'''Чтения с реплик, записи в default.
+
+ReplicaMiddleware разрешает реплики только на время GET-запроса к
+представлениям из REPLICA_READ_VIEWS; всё остальное — формы, команды,
+фоновые потоки — читает из default. Если запрос что-то записал,
+сессия закрепляется за default на REPLICA_PIN_SECONDS: автор сразу
+видит свой пост или комментарий, даже пока реплика отстаёт. Записью
+считается любой успешный запрос не GET/HEAD: db_for_write зовётся и
+при простом присваивании связи, так что по нему запись не отличить.
+'''
+import random
+import threading
+import time
+
+from django.db import DEFAULT_DB_ALIAS
+
+from yatube.settings import (DATABASE_REPLICAS, REPLICA_PIN_SECONDS,
+                             REPLICA_READ_VIEWS)
+
+PIN_SESSION_KEY = '_replica_pin'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_state = threading.local()
+
+
+def reading_replica():
+    '''Читает ли текущий запрос с реплики.'''
+    return getattr(_state, 'replica', False)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if DATABASE_REPLICAS and reading_replica():
+            return random.choice(DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же строки, что в default.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплики переносит репликация, а не migrate.
+        return db == DEFAULT_DB_ALIAS
+
+
+def routed(match):
+    if match is None:
+        return False
+    return (match.view_name in REPLICA_READ_VIEWS
+            or f'{match.namespace}:*' in REPLICA_READ_VIEWS)
+
+
+def pinned(request):
+    session = getattr(request, 'session', None)
+    if session is None:
+        return False
+    return session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+class ReplicaMiddleware:
+    '''Включает реплики для чтений и закрепляет сессию после записи.'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replica = False
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.replica = False
+        session = getattr(request, 'session', None)
+        if (DATABASE_REPLICAS and session is not None
+                and request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            session[PIN_SESSION_KEY] = time.time() + REPLICA_PIN_SECONDS
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Сессия читается раньше, чем включаются реплики, — из default.
+        if (DATABASE_REPLICAS and request.method in SAFE_METHODS
+                and routed(request.resolver_match) and not pinned(request)):
+            _state.replica = True
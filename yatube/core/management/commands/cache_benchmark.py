@@ -0,0 +1,73 @@
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.core.management.commands.createcachetable import (
+    Command as CreateCacheTable)
+from django.db import DEFAULT_DB_ALIAS, connection
+
+from core.cache import SQLiteCache
+
+BENCH_TABLE = 'core_cache_benchmark'
+PAGE = 10
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLiteCache с LocMemCache и DatabaseCache '
+            'на операциях get/set/get_many/set_many/incr.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+        parser.add_argument('--size', type=int, default=2048,
+                            help='Размер значения в байтах.')
+
+    def backends(self, directory, params):
+        yield 'locmem', LocMemCache('benchmark', params)
+        yield 'sqlite', SQLiteCache(
+            os.path.join(directory, 'cache.sqlite3'), params)
+        creator = CreateCacheTable()
+        creator.verbosity = 0
+        creator.create_table(DEFAULT_DB_ALIAS, BENCH_TABLE, False)
+        try:
+            yield 'database', DatabaseCache(BENCH_TABLE, params)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DROP TABLE {connection.ops.quote_name(BENCH_TABLE)}')
+
+    def measure(self, operation, iterations):
+        started = time.perf_counter()
+        for i in range(iterations):
+            operation(i)
+        elapsed = time.perf_counter() - started
+        return iterations / elapsed
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        value = b'x' * options['size']
+        keys = [f'bench:{i}' for i in range(iterations)]
+        self.stdout.write('backend\tset\tget\tget_many\tset_many\tincr '
+                          '(оп/с)')
+        with tempfile.TemporaryDirectory() as directory:
+            params = {'OPTIONS': {'MAX_ENTRIES': iterations * 2}}
+            for name, cache in self.backends(directory, params):
+                cache.clear()
+                cache.set('bench:counter', 0)
+                page = [keys[i:i + PAGE] for i in range(0, iterations, PAGE)]
+                results = [
+                    self.measure(lambda i: cache.set(keys[i], value),
+                                 iterations),
+                    self.measure(lambda i: cache.get(keys[i]), iterations),
+                    self.measure(lambda i: cache.get_many(page[i]),
+                                 len(page)),
+                    self.measure(lambda i: cache.set_many(
+                        dict.fromkeys(page[i], value)), len(page)),
+                    self.measure(lambda i: cache.incr('bench:counter'),
+                                 iterations),
+                ]
+                cache.clear()
+                self.stdout.write(name + ''.join(
+                    f'\t{rate:.0f}' for rate in results))
@@ -0,0 +1,151 @@
+'''Отдача файлов MEDIA_ROOT: проверки доступа, условные запросы и
+диапазоны байтов; саму передачу можно поручить фронтовому прокси.'''
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from yatube.settings import (MEDIA_ACCEL_PREFIX, MEDIA_PUBLIC_DIRS,
+                             MEDIA_SENDFILE)
+
+BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def resolve(root, path):
+    '''Абсолютный путь файла для URL-пути или Http404.
+
+    Отдаются только обычные файлы из MEDIA_PUBLIC_DIRS; «..»,
+    скрытые файлы (в том числе временные файлы записи) и всё прочее
+    в MEDIA_ROOT снаружи не видны.
+    '''
+    parts = path.split('/')
+    if (not path or posixpath.normpath(path) != path
+            or path.startswith('/')
+            or any(not part or part.startswith('.') for part in parts)
+            or parts[0] not in MEDIA_PUBLIC_DIRS):
+        raise Http404
+    full_path = os.path.join(root, *parts)
+    if not os.path.isfile(full_path) or os.path.islink(full_path):
+        raise Http404
+    return full_path
+
+
+def etag(stat):
+    '''Сильный ETag из времени изменения и размера, как у nginx.'''
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def byte_range(request, stat, tag):
+    '''(начало, конец) запрошенного диапазона или None для всего файла.
+
+    Несколько диапазонов сразу и нераспознанный заголовок — весь файл:
+    RFC 7233 это разрешает. If-Range, не совпавший с текущей версией
+    файла, тоже означает весь файл.
+    '''
+    header = request.META.get('HTTP_RANGE')
+    if not header:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != tag:
+        since = parse_http_date_safe(if_range)
+        if since is None or int(stat.st_mtime) > since:
+            return None
+    found = RANGE_RE.match(header.strip())
+    if found is None:
+        return None
+    first, last = found.groups()
+    size = stat.st_size
+    if not first:
+        if not last or not int(last) or not size:
+            raise RangeNotSatisfiable
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def read(path, start, length):
+    with open(path, 'rb') as source:
+        source.seek(start)
+        while length:
+            chunk = source.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def content_type(path):
+    guessed, encoding = mimetypes.guess_type(path)
+    if encoding:
+        return 'application/octet-stream'
+    return guessed or 'application/octet-stream'
+
+
+def sendfile(path, full_path):
+    '''Пустой ответ, по которому файл отдаст сам прокси.
+
+    X-Accel-Redirect (nginx) указывает на internal-location,
+    смотрящий в MEDIA_ROOT; X-Sendfile (Apache, lighttpd) — на путь
+    в файловой системе. Диапазоны прокси обрабатывает сам.
+    '''
+    response = HttpResponse(content_type=content_type(full_path))
+    if MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX + quote(path)
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def stream(request, full_path, stat, tag):
+    '''Ответ приложения: весь файл или один диапазон байтов.'''
+    size = stat.st_size
+    try:
+        requested = byte_range(request, stat, tag)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    start, end = requested or (0, size - 1)
+    length = max(0, end - start + 1)
+    response = StreamingHttpResponse(
+        read(full_path, start, length), content_type=content_type(full_path))
+    if requested is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = length
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve(request, root, path):
+    '''Файл path из root с учётом If-None-Match и If-Modified-Since.
+
+    Условные запросы решаются здесь по одному stat(), до передачи
+    прокси: 304 не требует ни открытия файла, ни его отдачи.
+    '''
+    full_path = resolve(root, path)
+    stat = os.stat(full_path)
+    tag = etag(stat)
+    response = get_conditional_response(
+        request, etag=tag, last_modified=int(stat.st_mtime))
+    if response is None:
+        if MEDIA_SENDFILE:
+            response = sendfile(path, full_path)
+        else:
+            response = stream(request, full_path, stat, tag)
+    response['ETag'] = tag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
@@ -0,0 +1,59 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE = 64 * 1024
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+# Имена, выданные ContentAddressedStorage, и производные от них файлы:
+# миниатюры sorl (cache/) и варианты srcset (variants/).
+IMMUTABLE_RE = re.compile(
+    r'^(?:[\w/-]+/(?:[0-9a-f]{%d}/){%d}(?:variants/)?[0-9a-f]{64}'
+    r'(?:-\d+)?\.\w+|cache/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}'
+    r'(?:@\w+)?\.\w+)$' % (SHARD_WIDTH, SHARD_DEPTH))
+
+
+def content_digest(content):
+    sha256 = hashlib.sha256()
+    for chunk in content.chunks(CHUNK_SIZE):
+        sha256.update(chunk)
+    content.seek(0)
+    return sha256.hexdigest()
+
+
+def is_immutable(name):
+    '''Содержимое файла с таким именем никогда не меняется.'''
+    return IMMUTABLE_RE.match(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    '''Файлы именуются sha256 содержимого: posts/ab/cd/abcd….jpg.
+
+    Каталог из upload_to сохраняется, имя заменяется хэшем, а первые
+    байты хэша раскладывают файлы по подкаталогам, чтобы в одном не
+    скапливались миллионы. Повторная загрузка тех же байтов не пишет
+    ничего и возвращает уже сохранённое имя.
+    '''
+
+    def content_name(self, name, digest):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        shards = [
+            digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+            for i in range(SHARD_DEPTH)
+        ]
+        return posixpath.join(directory, *shards, digest + extension)
+
+    def _save(self, name, content):
+        name = self.content_name(name, content_digest(content))
+        if self.exists(name):
+            # Свежее mtime защищает файл от сборщика сирот (gc_media):
+            # на него вот-вот сошлётся новый пост.
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
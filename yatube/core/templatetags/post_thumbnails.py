@@ -0,0 +1,19 @@
+from django import template
+
+from posts.ingestion import ensure_derived, srcset
+from posts.thumbnails import thumbnail_or_placeholder
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, alias='card'):
+    thumbnail = thumbnail_or_placeholder(image, alias)
+    if getattr(image, 'thumbnail_pending', False):
+        ensure_derived(image.instance)
+    return thumbnail
+
+
+@register.simple_tag
+def post_srcset(post, extension):
+    return srcset(post, extension)
@@ -0,0 +1,370 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.http import Http404
+from django.test import (Client, RequestFactory, SimpleTestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from .cache import SQLiteCache
+from .db import PIN_SESSION_KEY, ReplicaRouter
+from .storage import ContentAddressedStorage, is_immutable
+from .views import IMMUTABLE_CACHE_CONTROL, media
+from posts.models import Post
+from yatube.settings import REPLICA_CACHE_TIMEOUT
+
+
+def _incr_many(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_basic_operations(self):
+        """get/set/add/delete/has_key работают как у LocMemCache."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'другое'))
+        self.assertTrue(self.cache.add('new', True))
+        self.assertIs(self.cache.get('new'), True)
+        self.assertTrue(self.cache.has_key('key'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_many(self):
+        """get_many/set_many/delete_many работают пачкой."""
+        self.cache.set_many({'a': 1, 'b': 'два', 'c': [3]})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'missing']),
+                         {'a': 1, 'b': 'два'})
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': [3]})
+
+    def test_ttl(self):
+        """Истёкшие ключи не отдаются и могут быть заняты add."""
+        self.cache.set('short', 1, 0.05)
+        self.cache.set('forever', 1, None)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 2))
+        self.assertEqual(self.cache.get('forever'), 1)
+        self.assertTrue(self.cache.touch('forever', 0.05))
+        time.sleep(0.1)
+        self.assertFalse(self.cache.has_key('forever'))
+
+    def test_incr(self):
+        """incr атомарен и не трогает отсутствующие ключи."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.decr('counter'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_big_ints(self):
+        """Целые вне диапазона INTEGER хранятся и увеличиваются."""
+        for value in (2 ** 63, -2 ** 63 - 1, 10 ** 30):
+            self.cache.set('big', value)
+            self.assertEqual(self.cache.get('big'), value)
+        self.cache.set('edge', 2 ** 63 - 1)
+        self.assertEqual(self.cache.incr('edge'), 2 ** 63)
+        self.assertEqual(self.cache.get('edge'), 2 ** 63)
+        self.assertEqual(self.cache.decr('edge'), 2 ** 63 - 1)
+
+    def test_shared_between_processes(self):
+        """Процессы видят общий кэш и не теряют инкременты."""
+        self.cache.set('counter', 0)
+        workers = [
+            multiprocessing.Process(target=_incr_many, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные ключи."""
+        cache = SQLiteCache(self.path, {'OPTIONS': {
+            'MAX_ENTRIES': 10, 'CULL_EVERY': 1, 'CULL_FREQUENCY': 10,
+            'LRU_RESOLUTION': 0,
+        }})
+        for i in range(10):
+            cache.set(f'key{i}', i)
+            time.sleep(0.001)
+        cache.get('key0')
+        cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+
+    def test_tests_use_own_file(self):
+        """Тесты не делят файл кэша с сайтом на том же узле."""
+        self.assertEqual(os.path.basename(cache._path),
+                         'test_cache.sqlite3')
+
+
+class ContentAddressedStorageTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_name_is_sharded_hash(self):
+        """Имя файла — sha256 содержимого, разложенный по подкаталогам."""
+        digest = hashlib.sha256(b'image').hexdigest()
+        name = self.storage.save('posts/photo.JPG', ContentFile(b'image'))
+        self.assertEqual(name,
+                         f'posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg')
+        self.assertTrue(is_immutable(name))
+
+    def test_same_content_is_stored_once(self):
+        """Повторная загрузка тех же байтов не создаёт копию."""
+        first = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'same'))
+        other = self.storage.save('posts/a.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        files = [name for _, _, names in os.walk(self.directory)
+                 for name in names]
+        self.assertEqual(len(files), 2)
+
+    def test_media_view_marks_immutable_files(self):
+        """Файлы с адресом по содержимому отдаются с вечным кэшем."""
+        name = self.storage.save('posts/photo.gif', ContentFile(b'gif'))
+        legacy = 'posts/photo.gif'
+        with open(os.path.join(self.directory, legacy), 'wb') as output:
+            output.write(b'gif')
+        request = RequestFactory().get('/media/')
+        with override_settings(MEDIA_ROOT=self.directory):
+            response = media(request, name)
+            self.assertEqual(response['Cache-Control'],
+                             IMMUTABLE_CACHE_CONTROL)
+            response = media(request, legacy)
+            self.assertFalse(response.has_header('Cache-Control'))
+
+
+class MediaViewTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'posts'))
+        self.path = 'posts/photo.gif'
+        with open(os.path.join(self.directory, self.path), 'wb') as output:
+            output.write(b'0123456789')
+        self.factory = RequestFactory()
+        media_root = override_settings(MEDIA_ROOT=self.directory)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get(self, path=None, **headers):
+        return media(self.factory.get('/media/', **headers),
+                     path or self.path)
+
+    def test_streams_file_with_validators(self):
+        """Файл отдаётся целиком с ETag, Last-Modified и Accept-Ranges."""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+    def test_conditional_requests(self):
+        """Совпавший ETag или неизменённый файл дают 304 без тела."""
+        tag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], tag)
+        response = self.get(HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 304)
+        response = self.get(HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_byte_ranges(self):
+        """Диапазон отдаётся с 206, невыполнимый — с 416."""
+        response = self.get(HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        response = self.get(HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        response = self.get(HTTP_RANGE='bytes=7-')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        response = self.get(HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+        response = self.get(HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        """Устаревший If-Range означает весь файл, а не кусок новой версии."""
+        response = self.get(HTTP_RANGE='bytes=2-4', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        tag = response['ETag']
+        response = self.get(HTTP_RANGE='bytes=2-4', HTTP_IF_RANGE=tag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_access_checks(self):
+        """Наружу видны только обычные файлы публичных каталогов."""
+        with open(os.path.join(self.directory, 'secret.txt'), 'w') as output:
+            output.write('secret')
+        with open(os.path.join(self.directory, 'posts', '.tmp1'), 'w'):
+            pass
+        for path in ('secret.txt', 'posts/../secret.txt', 'posts/.tmp1',
+                     '/etc/passwd', 'posts', 'posts/missing.gif',
+                     'posts//photo.gif'):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self.get(path)
+        response = media(self.factory.post('/media/'), self.path)
+        self.assertEqual(response.status_code, 405)
+
+    def test_sendfile_hands_transfer_to_proxy(self):
+        """С MEDIA_SENDFILE тело не читается, путь получает прокси."""
+        with mock.patch('core.media.MEDIA_SENDFILE', 'x-accel-redirect'):
+            response = self.get()
+            self.assertEqual(response['X-Accel-Redirect'],
+                             '/internal-media/posts/photo.gif')
+            self.assertEqual(response.content, b'')
+            self.assertEqual(response['Content-Type'], 'image/gif')
+            self.assertIn('ETag', response)
+            tag = response['ETag']
+            response = self.get(HTTP_IF_NONE_MATCH=tag)
+            self.assertEqual(response.status_code, 304)
+            self.assertNotIn('X-Accel-Redirect', response)
+        with mock.patch('core.media.MEDIA_SENDFILE', 'x-sendfile'):
+            response = self.get()
+            self.assertEqual(response['X-Sendfile'], os.path.join(
+                self.directory, 'posts', 'photo.gif'))
+
+
+@mock.patch('core.db.DATABASE_REPLICAS', ('replica',))
+class ReplicaRouterTest(TransactionTestCase):
+    # replica — отдельная база, которую догоняет replicate(). Копируется
+    # только зафиксированное, поэтому без TestCase.
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.user, text='С реплики')
+        self.replicate()
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def replicate(self):
+        '''Реплика догоняет default: копия базы через backup SQLite.'''
+        for alias in ('default', 'replica'):
+            connections[alias].ensure_connection()
+        connections['default'].connection.backup(
+            connections['replica'].connection)
+
+    def queries(self, method, name, **kwargs):
+        url = reverse(name, kwargs=kwargs or None)
+        with CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, method)(url, {'text': 'Ответ'})
+        return response, len(default), len(replica)
+
+    def test_list_and_detail_read_from_replica(self):
+        """GET списков и страниц постов читает с реплики."""
+        for name, kwargs in (
+                ('group_posts:index', {}),
+                ('group_posts:profile', {'username': 'reader'}),
+                ('group_posts:post_detail', {'post_id': self.post.id})):
+            with self.subTest(name=name):
+                response, _, replica = self.queries('get', name, **kwargs)
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(replica, 0)
+                self.assertContains(response, 'С реплики')
+
+    def test_other_views_read_from_default(self):
+        """Формы и не перечисленные представления реплику не трогают."""
+        _, default, replica = self.queries('get', 'group_posts:post_create')
+        self.assertGreater(default, 0)
+        self.assertEqual(replica, 0)
+
+    def test_write_pins_session_to_default(self):
+        """После записи сессия какое-то время читает свои изменения."""
+        response, _, replica = self.queries(
+            'post', 'group_posts:add_comment', post_id=self.post.id)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(replica, 0)
+        self.assertIn(PIN_SESSION_KEY, self.client.session)
+        response, default, replica = self.queries(
+            'get', 'group_posts:post_detail', post_id=self.post.id)
+        self.assertContains(response, 'Ответ')
+        self.assertEqual(replica, 0)
+        with mock.patch('core.db.time.time', return_value=time.time() + 60):
+            _, _, replica = self.queries('get', 'group_posts:index')
+        self.assertGreater(replica, 0)
+
+    def later(self, seconds):
+        return mock.patch('time.time', return_value=time.time() + seconds)
+
+    def test_lagging_replica_serves_old_data(self):
+        """Реплика отстаёт, а её страницы живут не дольше лага."""
+        url = reverse('group_posts:index')
+        Post.objects.create(author=self.user, text='Ещё не на реплике')
+        self.assertNotContains(self.client.get(url), 'Ещё не на реплике')
+        self.replicate()
+        self.assertNotContains(self.client.get(url), 'Ещё не на реплике')
+        with self.later(REPLICA_CACHE_TIMEOUT + 1):
+            self.assertContains(self.client.get(url), 'Ещё не на реплике')
+
+    def test_pinned_session_reads_its_writes(self):
+        """Автор видит свой комментарий сразу, остальные — после лага."""
+        url = reverse('group_posts:post_detail', args=[self.post.id])
+        self.client.post(
+            reverse('group_posts:add_comment', args=[self.post.id]),
+            {'text': 'Ответ'})
+        self.assertContains(self.client.get(url), 'Ответ')
+        self.assertNotContains(Client().get(url), 'Ответ')
+        self.replicate()
+        with self.later(REPLICA_CACHE_TIMEOUT + 1):
+            self.assertContains(Client().get(url), 'Ответ')
+
+    def test_replica_pages_have_no_etag(self):
+        """ETag с реплики не закрепил бы старую копию ответом 304."""
+        url = reverse('group_posts:post_detail', args=[self.post.id])
+        response = Client().get(url)
+        self.assertNotIn('ETag', response)
+        with mock.patch('core.db.DATABASE_REPLICAS', ()):
+            response = Client().get(url)
+        self.assertIn('ETag', response)
+
+    def test_router_defaults(self):
+        """Вне запроса чтения и записи идут в default, миграции — тоже."""
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(User), 'default')
+        self.assertEqual(router.db_for_write(User), 'default')
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
@@ -1,5 +1,12 @@
 
+from django.conf import settings
 from django.shortcuts import render
+from django.views.decorators.http import require_safe
+
+from . import media as media_files
+from .storage import is_immutable
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 
 
 def page_not_found(request, exception):
@@ -16,3 +23,15 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@require_safe
+def media(request, path):
+    '''Отдаёт MEDIA_ROOT; неизменяемые файлы кэшируются навсегда.
+
+    С MEDIA_SENDFILE сама передача файла уходит фронтовому прокси.
+    '''
+    response = media_files.serve(request, settings.MEDIA_ROOT, path)
+    if response.status_code in (200, 206, 304) and is_immutable(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
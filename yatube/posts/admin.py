@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Group, Post
+from .search import engine as search_engine
 
 
 @admin.register(Post)
@@ -11,5 +12,9 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        '''Поиск через полнотекстовый индекс вместо LIKE по всей таблице.'''
+        return search_engine().filter(queryset, search_term), False
+
 
 admin.site.register(Group)
@@ -0,0 +1,239 @@
+import hashlib
+import time
+from collections import namedtuple
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import Comment, Group, Post, User
+from core.db import reading_replica
+from yatube.settings import REPLICA_CACHE_TIMEOUT
+
+GENERATION_PREFIX = 'gen:'
+
+# Области кэша страницы и время последнего изменения её содержимого,
+# найденное по индексу тем же запросом, что и области.
+PageState = namedtuple('PageState', 'scopes changed')
+
+
+def _initial_generation():
+    # Поколение, потерянное при вытеснении, не должно вернуться к старому
+    # значению и оживить страницы, закэшированные до записи.
+    return int(time.time() * 1000)
+
+
+def generations(scopes):
+    '''Текущие поколения scopes одним get_many.'''
+    keys = [GENERATION_PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    result = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_generation(), None)
+            found[key] = cache.get(key)
+        result.append(found[key])
+    return result
+
+
+def bump(*scopes):
+    '''Сдвигает поколения: все страницы этих областей становятся новыми.'''
+    for scope in set(scopes):
+        key = GENERATION_PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), None)
+
+
+def page_state(request, scopes, kwargs):
+    '''scopes(**kwargs) не больше одного раза за запрос.'''
+    states = request.__dict__.setdefault('_page_states', {})
+    if scopes not in states:
+        states[scopes] = scopes(**kwargs)
+    return states[scopes]
+
+
+def viewer(request, per_user=True):
+    '''id зрителя для ключей; 0 — гость или страница, общая для всех.'''
+    if per_user and request.user.is_authenticated:
+        return request.user.pk
+    return 0
+
+
+def csrf_secret(request, per_user=True):
+    '''CSRF-cookie зрителя, если его страница содержит формы.
+
+    Токен в разметке годится только при той cookie, с которой он
+    выпущен: вход меняет её, а у второго браузера той же сессии она
+    своя. Поэтому своя копия страницы — на каждую cookie.
+    '''
+    if not viewer(request, per_user):
+        return ''
+    return request.META.get('CSRF_COOKIE', '')
+
+
+def page_key(request, name, scopes, per_user=True):
+    path = hashlib.md5(
+        (request.get_full_path() + csrf_secret(request, per_user)).encode()
+    ).hexdigest()
+    versions = '.'.join(str(gen) for gen in generations(scopes))
+    return f'page:{name}:{path}:{viewer(request, per_user)}:{versions}'
+
+
+def page_etag(request, name, state, per_user=True):
+    '''Слабый ETag страницы: зритель, его CSRF-cookie, поколения и
+    последнее изменение.
+
+    Слабый, потому что маска CSRF-токена в разметке разная при равном
+    содержимом.
+    '''
+    changed = state.changed.isoformat() if state.changed else ''
+    versions = '.'.join(str(gen) for gen in generations(state.scopes))
+    digest = hashlib.md5(
+        f'{name}:{viewer(request, per_user)}:'
+        f'{csrf_secret(request, per_user)}:{versions}:{changed}'.encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def revalidate(response, per_user=True):
+    if per_user:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+
+
+def condition_by(scopes, per_user=True):
+    '''Отвечает 304 на If-None-Match, не вызывая view.
+
+    Валидатор строится из того же, что и ключ cache_page_by, плюс
+    времени последнего изменения из индексированного агрегата, так что
+    проверка стоит одного запроса к БД и одного get_many кэша.
+    Ответы помечены no-cache: браузер должен их перепроверять, — и
+    private, если страница своя у каждого зрителя (per_user). Страница
+    с реплики ETag не получает: поколения в кэше уже учли запись, до
+    которой реплика могла не дойти, и 304 закрепил бы старую копию.
+    '''
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            state = page_state(request, scopes, kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            etag = None
+            response = None
+            if not reading_replica():
+                csrf = csrf_secret(request, per_user)
+                etag = page_etag(request, view.__name__, state, per_user)
+                response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if etag and csrf_secret(request, per_user) != csrf:
+                    # Рендер выпустил CSRF-cookie: браузер придёт с ней.
+                    etag = page_etag(request, view.__name__, state,
+                                     per_user)
+            if response.status_code in (200, 304):
+                if etag:
+                    response['ETag'] = etag
+                revalidate(response, per_user)
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_page_by(timeout, scopes, per_user=True):
+    '''Кэширует GET-ответ view под ключом из поколений scopes.
+
+    scopes(**kwargs) возвращает PageState с областями, от которых
+    зависит страница, или None, если кэшировать нельзя. Запись в любую
+    из областей сдвигает её поколение, и следующий запрос строит
+    страницу заново, поэтому timeout может быть долгим. Без per_user
+    одна копия страницы отдаётся всем зрителям. Страница с реплики могла
+    не застать запись, уже сдвинувшую поколение, поэтому живёт не
+    дольше REPLICA_CACHE_TIMEOUT.
+    '''
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            state = page_state(request, scopes, kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            key = page_key(request, view.__name__, state.scopes, per_user)
+            response = cache.get(key)
+            if response is None:
+                csrf = csrf_secret(request, per_user)
+                response = view(request, *args, **kwargs)
+                if csrf_secret(request, per_user) != csrf:
+                    # CSRF-cookie ставит middleware уже после view, в
+                    # response.cookies её нет; кладём страницу под ключ
+                    # той cookie, с которой браузер придёт дальше.
+                    key = page_key(request, view.__name__, state.scopes,
+                                   per_user)
+                if response.status_code == 200 and not response.cookies:
+                    lifetime = timeout
+                    if reading_replica():
+                        lifetime = min(timeout, REPLICA_CACHE_TIMEOUT)
+                    cache.set(key, response, lifetime)
+            return response
+        return wrapper
+    return decorator
+
+
+def latest(queryset, field):
+    '''Подзапрос: наибольшее field в queryset, одним шагом по индексу.'''
+    return Subquery(queryset.order_by(f'-{field}').values(field)[:1])
+
+
+def feed_scopes(scopes):
+    '''Области ленты — те же, что у её страницы; формат их не меняет.'''
+    @wraps(scopes)
+    def wrapper(kind, **kwargs):
+        return scopes(**kwargs)
+    return wrapper
+
+
+def index_scopes():
+    return PageState(['index'], None)
+
+
+def group_scopes(slug):
+    row = Group.objects.filter(slug=slug).annotate(changed=latest(
+        Post.objects.filter(group=OuterRef('pk')), 'pub_date'),
+    ).values_list('pk', 'changed').first()
+    if row is None:
+        return None
+    group_id, changed = row
+    return PageState([f'group:{group_id}'], changed)
+
+
+def profile_scopes(username):
+    row = User.objects.filter(username=username).annotate(changed=latest(
+        Post.objects.filter(author=OuterRef('pk')), 'pub_date'),
+    ).values_list('pk', 'changed').first()
+    if row is None:
+        return None
+    author_id, changed = row
+    return PageState([f'author:{author_id}'], changed)
+
+
+def post_scopes(post_id):
+    row = Post.objects.filter(pk=post_id).annotate(changed=latest(
+        Comment.objects.filter(post=OuterRef('pk')), 'created'),
+    ).values_list('author_id', 'changed').first()
+    if row is None:
+        return None
+    author_id, changed = row
+    return PageState([f'post:{post_id}', f'author:{author_id}'], changed)
+
+
+def post_changed(post, old_group_id=None):
+    scopes = ['index', f'author:{post.author_id}', f'post:{post.pk}']
+    for group_id in (post.group_id, old_group_id):
+        if group_id is not None:
+            scopes.append(f'group:{group_id}')
+    bump(*scopes)
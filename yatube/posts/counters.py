@@ -0,0 +1,83 @@
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def bump(user_id, field, delta):
+    '''Атомарно сдвигает счётчик пользователя на delta через F().
+
+    Если строки счётчиков ещё нет, при росте она создаётся пересчётом,
+    который уже учитывает изменение; уменьшать отсутствующее нечего.
+    '''
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    if not stats.update(**{field: F(field) + delta}) and delta > 0:
+        reconcile_user(user_id)
+
+
+def bump_comments(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def stats_for(user):
+    '''Счётчики пользователя; недостающая строка создаётся пересчётом.'''
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return reconcile_user(user.pk)
+
+
+def reconcile_user(user_id):
+    stats, _ = UserStats.objects.update_or_create(user_id=user_id, defaults={
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    })
+    return stats
+
+
+def _actual(model, fk, outer):
+    rows = model.objects.filter(**{fk: OuterRef(outer)}).order_by().values(
+        fk).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows), 0)
+
+
+def _fix(queryset, **actual):
+    '''Записывает верные значения в строки, где счётчики разошлись.'''
+    annotations = {f'actual_{field}': expr for field, expr in actual.items()}
+    drifted = queryset.annotate(**annotations).filter(reduce(or_, [
+        ~Q(**{field: F(f'actual_{field}')}) for field in actual
+    ]))
+    fixed = 0
+    for row in drifted.values('pk', *annotations).iterator():
+        queryset.filter(pk=row['pk']).update(**{
+            field: row[f'actual_{field}'] for field in actual
+        })
+        fixed += 1
+    return fixed
+
+
+def reconcile():
+    '''Пересчитывает все счётчики; возвращает число исправленных строк.'''
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True)
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in missing.iterator()],
+        ignore_conflicts=True,
+    )
+    fixed = _fix(
+        UserStats.objects.all(),
+        posts_count=_actual(Post, 'author', 'user_id'),
+        followers_count=_actual(Follow, 'author', 'user_id'),
+        following_count=_actual(Follow, 'user', 'user_id'),
+    )
+    return fixed + _fix(Post.objects.all(),
+                        comments_count=_actual(Comment, 'post', 'pk'))
@@ -0,0 +1,161 @@
+'''Потоковая выгрузка постов и комментариев в NDJSON или CSV.
+
+Записи в NDJSON совпадают с форматом import_jsonl, так что выгрузку
+можно загрузить обратно, в том числе в ту же базу: авторы и группы
+идут отдельными записями перед постами, а уже имеющиеся посты и
+комментарии импорт пропускает. Комментарии пользователя к чужим
+постам ссылаются на посты не из выгрузки; в другую базу такую
+выгрузку загружают с import_jsonl --skip-orphans.
+
+Память не растёт с объёмом: строки читаются iterator() порциями,
+кодируются блоками и сразу отдаются, а gzip сжимает поток на лету.
+'''
+import csv
+import json
+import zlib
+
+from django.db.models import Q
+
+from .models import Comment, Group, Post, User
+from yatube.settings import EXPORT_BLOCK_SIZE, EXPORT_CHUNK_SIZE
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+FORMATS = {
+    NDJSON: 'application/x-ndjson',
+    CSV: 'text/csv',
+}
+# Пользователи и группы нужны только для обратной загрузки NDJSON.
+CSV_TYPES = ('post', 'comment')
+CSV_COLUMNS = ('type', 'id', 'post', 'author', 'group', 'text', 'date',
+               'image')
+# wbits 16 + 15: zlib пишет заголовок и хвост gzip.
+GZIP_WBITS = 31
+
+
+def user_record(username, first_name, last_name):
+    return {'type': 'user', 'username': username,
+            'first_name': first_name, 'last_name': last_name}
+
+
+def user_records_of(users):
+    rows = users.order_by('id').values_list(
+        'username', 'first_name', 'last_name')
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield user_record(*row)
+
+
+def group_records_of(groups):
+    rows = groups.order_by('id').values_list('slug', 'title', 'description')
+    for slug, title, description in rows.iterator(
+            chunk_size=EXPORT_CHUNK_SIZE):
+        yield {'type': 'group', 'slug': slug, 'title': title,
+               'description': description}
+
+
+def post_records(posts):
+    rows = posts.order_by('id').values_list(
+        'id', 'author__username', 'group__slug', 'text', 'pub_date',
+        'image')
+    for post_id, author, group, text, pub_date, image in rows.iterator(
+            chunk_size=EXPORT_CHUNK_SIZE):
+        yield {'type': 'post', 'id': post_id, 'author': author,
+               'group': group, 'text': text,
+               'pub_date': pub_date.isoformat(), 'image': image}
+
+
+def comment_records(comments):
+    rows = comments.order_by('id').values_list(
+        'id', 'post_id', 'author__username', 'text', 'created')
+    for comment_id, post_id, author, text, created in rows.iterator(
+            chunk_size=EXPORT_CHUNK_SIZE):
+        yield {'type': 'comment', 'id': comment_id, 'post': post_id,
+               'author': author, 'text': text,
+               'created': created.isoformat()}
+
+
+def user_records(user):
+    '''Пользователь, группы его постов, посты и его комментарии.'''
+    yield user_record(user.username, user.first_name, user.last_name)
+    yield from group_records_of(Group.objects.filter(
+        pk__in=Post.objects.filter(author=user).values('group_id')))
+    yield from post_records(Post.objects.filter(author=user))
+    yield from comment_records(Comment.objects.filter(author=user))
+
+
+def group_records(group):
+    '''Группа, авторы, посты группы и комментарии к ним.'''
+    # Подзапросы, а не JOIN: иначе строки авторов множатся на их посты.
+    yield from user_records_of(User.objects.filter(
+        Q(pk__in=Post.objects.filter(group=group).values('author_id'))
+        | Q(pk__in=Comment.objects.filter(
+            post__group=group).values('author_id'))))
+    yield from group_records_of(Group.objects.filter(pk=group.pk))
+    yield from post_records(Post.objects.filter(group=group))
+    yield from comment_records(Comment.objects.filter(post__group=group))
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class _Line:
+    '''Файл для csv.writer: write() возвращает строку, не копя её.'''
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.writer(_Line())
+    yield writer.writerow(CSV_COLUMNS)
+    for record in records:
+        if record['type'] not in CSV_TYPES:
+            continue
+        yield writer.writerow([
+            record['type'], record['id'], record.get('post', ''),
+            record['author'], record.get('group') or '', record['text'],
+            record.get('pub_date') or record.get('created'),
+            record.get('image', ''),
+        ])
+
+
+def blocks(lines, size=EXPORT_BLOCK_SIZE):
+    '''Склеивает строки в блоки байтов около size: меньше мелких write().'''
+    block = []
+    length = 0
+    for line in lines:
+        data = line.encode()
+        block.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(block)
+            block = []
+            length = 0
+    if block:
+        yield b''.join(block)
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=GZIP_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(records, format=NDJSON, compress=False):
+    '''Байты выгрузки records в формате format, по блокам.'''
+    lines = csv_lines(records) if format == CSV else ndjson_lines(records)
+    chunks = blocks(lines)
+    return gzipped(chunks) if compress else chunks
+
+
+def filename(name, format=NDJSON, compress=False):
+    return f'yatube-{name}.{format}' + ('.gz' if compress else '')
+
+
+def content_type(format=NDJSON, compress=False):
+    return 'application/gzip' if compress else FORMATS[format]
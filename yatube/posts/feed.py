@@ -0,0 +1,379 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils.functional import cached_property
+
+from .models import FeedEntry, Follow, Post, User, UserStats
+from .paginators import POST_ORDERING, CursorPaginator
+from yatube.settings import (FEED_BACKFILL_POSTS, FEED_BATCH_SIZE,
+                             FEED_COMPLETE_TIMEOUT)
+
+FEED_ORDERING = ('-feed_pub_date', '-feed_post_id')
+PUSH = 'push'
+PULL = 'pull'
+HYBRID = 'hybrid'
+# Метка полноты для extend() без before: дописывать нечего вовсе.
+COMPLETE = 'all'
+
+
+def celebrities(limit):
+    '''Счётчики авторов с числом подписчиков больше limit.'''
+    return UserStats.objects.filter(followers_count__gt=limit).order_by(
+        '-followers_count')
+
+
+def _celebrities_key(limit):
+    return f'feed:celebrities:{limit}'
+
+
+def celebrity_ids():
+    '''id авторов, у которых подписчиков больше FEED_PUSH_FOLLOWER_LIMIT.
+
+    Их посты не рассылаются по лентам, а подмешиваются при чтении.
+    Множество кэшируется, чтобы не пересчитывать его на каждый пост.
+    '''
+    limit = settings.FEED_PUSH_FOLLOWER_LIMIT
+    key = _celebrities_key(limit)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(celebrities(limit).values_list('user', flat=True))
+        cache.set(key, ids, settings.FEED_CELEBRITY_CACHE_TIMEOUT)
+    return ids
+
+
+def is_pushed(author_id):
+    '''Рассылаются ли посты автора по материализованным лентам.'''
+    mode = settings.FEED_MODE
+    if mode == PULL:
+        return False
+    return mode == PUSH or author_id not in celebrity_ids()
+
+
+def _bulk_insert(entries):
+    '''Вставляет записи ленты пачками, не собирая их в один список.'''
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, FEED_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    '''Доставляет новый пост в ленты всех подписчиков автора.'''
+    if not is_pushed(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True).iterator()
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in followers
+    )
+
+
+def _complete_key(user_id):
+    return f'feed:complete:{user_id}'
+
+
+def backfill(user_id, author_id):
+    '''Добавляет в ленту последние посты автора после подписки.'''
+    if not is_pushed(author_id):
+        return
+    # Посты автора старше FEED_BACKFILL_POSTS последних в ленте нет.
+    cache.delete(_complete_key(user_id))
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list('id', 'pub_date')
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts[:FEED_BACKFILL_POSTS].iterator()
+    )
+
+
+def pushed_authors(user_id):
+    '''Подзапрос: авторы, чьи посты лежат в материализованной ленте.'''
+    authors = Follow.objects.filter(user_id=user_id).values('author_id')
+    if settings.FEED_MODE == HYBRID:
+        authors = authors.exclude(author_id__in=celebrity_ids())
+    return authors
+
+
+def extend(user_id, before=None):
+    '''Дописывает в ленту посты подписок старше before, которых в ней нет.
+
+    backfill кладёт в ленту только FEED_BACKFILL_POSTS последних постов
+    автора, поэтому более старые доносятся, когда читатель доходит до
+    конца ленты: следующие FEED_BACKFILL_POSTS отсутствующих постов.
+    before — ключ (pub_date, id) последнего прочитанного поста.
+    Возвращает число добавленных записей.
+
+    Если добавлено меньше, чем просили, ниже before недостающих постов
+    нет; это запоминается, и на полной ленте последняя страница не
+    повторяет поиск. Метку сбрасывает backfill и resume_push.
+    '''
+    key = _complete_key(user_id)
+    complete = cache.get(key)
+    if complete == COMPLETE or (complete is not None and before is not None
+                                and tuple(before) <= complete):
+        return 0
+    posts = Post.objects.filter(
+        author_id__in=pushed_authors(user_id),
+    ).exclude(feed_entries__user_id=user_id)
+    if before is not None:
+        pub_date, post_id = before
+        posts = posts.filter(Q(pub_date__lt=pub_date)
+                             | Q(pub_date=pub_date, id__lt=post_id))
+    rows = list(posts.order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date')[:FEED_BACKFILL_POSTS])
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in rows],
+        ignore_conflicts=True,
+    )
+    if len(rows) < FEED_BACKFILL_POSTS:
+        cache.set(key, COMPLETE if before is None else tuple(before),
+                  FEED_COMPLETE_TIMEOUT)
+    return len(rows)
+
+
+def followers_changed(author_id, delta):
+    '''Реагирует на пересечение автором FEED_PUSH_FOLLOWER_LIMIT.
+
+    Кэш celebrity_ids сбрасывается при пересечении в любую сторону,
+    иначе до его истечения новые посты рассылались бы по старому
+    правилу. Вернувшийся под порог автор снова рассылается: посты,
+    написанные сверх порога, доставляются подписчикам, а подписчикам,
+    пришедшим в это время, делается backfill.
+    '''
+    if settings.FEED_MODE != HYBRID:
+        return
+    limit = settings.FEED_PUSH_FOLLOWER_LIMIT
+    count = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    crossed = limit + 1 if delta > 0 else limit
+    if count != crossed:
+        return
+    cache.delete(_celebrities_key(limit))
+    if delta < 0:
+        resume_push(author_id)
+
+
+def resume_push(author_id):
+    '''Дописывает ленты подписчиков автора, чьи посты не рассылались.'''
+    unpushed = Post.objects.filter(
+        author_id=author_id, feed_entries__isnull=True,
+    ).order_by('-pub_date', '-id').values_list('id', 'pub_date')
+    unpushed = list(unpushed[:FEED_BACKFILL_POSTS])
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True)
+    cache.delete_many([_complete_key(user_id)
+                       for user_id in followers.iterator()])
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id in followers.iterator()
+        for post_id, pub_date in unpushed
+    )
+    newcomers = followers.exclude(user__feed__post__author_id=author_id)
+    for user_id in newcomers.iterator():
+        backfill(user_id, author_id)
+
+
+def trim(user_id, author_id):
+    '''Убирает посты автора из ленты после отписки.'''
+    FeedEntry.objects.filter(user_id=user_id,
+                             post__author_id=author_id).delete()
+
+
+def rebuild():
+    '''Пересобирает все ленты по текущему графу подписок.'''
+    FeedEntry.objects.all().delete()
+    pairs = Follow.objects.values_list('user_id', 'author_id').distinct()
+    for user_id, author_id in pairs.iterator():
+        backfill(user_id, author_id)
+
+
+def feed_posts(user):
+    '''Посты ленты пользователя в порядке индекса ленты.'''
+    return Post.objects.filter(feed_entries__user=user).select_related(
+        'author', 'group').annotate(
+        feed_pub_date=F('feed_entries__pub_date'),
+        feed_post_id=F('feed_entries__post'),
+    ).order_by(*FEED_ORDERING)
+
+
+class NumberedFeedPaginator(Paginator):
+    '''Пагинация ленты с номерами страниц.
+
+    COUNT(*) по feed_posts() считал бы группы соединения Post и
+    FeedEntry; число постов ленты равно числу её записей, и их
+    count() — один проход по индексу ленты пользователя.
+    '''
+
+    def __init__(self, object_list, per_page, user_id):
+        super().__init__(object_list, per_page)
+        self.user_id = user_id
+
+    @cached_property
+    def count(self):
+        return FeedEntry.objects.filter(user_id=self.user_id).count()
+
+
+class FeedPaginator(CursorPaginator):
+    '''Курсорная пагинация материализованной ленты.
+
+    Пока записей не хватает на страницу вперёд, лента дописывается
+    extend() от последнего ключа и дочитывается.
+    '''
+
+    def __init__(self, object_list, per_page, user_id,
+                 ordering=FEED_ORDERING):
+        super().__init__(object_list, per_page, ordering)
+        self.user_id = user_id
+
+    def fetch(self, key, reverse, limit):
+        items = super().fetch(key, reverse, limit)
+        while not reverse and len(items) < limit:
+            if items:
+                key = self.key_for(items[-1])
+            if not extend(self.user_id, key):
+                break
+            items += super().fetch(key, reverse, limit - len(items))
+        return items
+
+
+class _Head:
+    '''Голова потока в куче слияния.
+
+    Пока поток автора не начат, post пуст, а key содержит только
+    границу pub_date из _heads() и бесконечность вместо id: такая
+    заглушка всплывает раньше любого настоящего поста этого автора.
+    '''
+    __slots__ = ('key', 'post', 'stream', 'descending')
+
+    def __init__(self, key, post, stream, descending):
+        self.key = key
+        self.post = post
+        self.stream = stream
+        self.descending = descending
+
+    def __lt__(self, other):
+        if self.descending:
+            return self.key > other.key
+        return self.key < other.key
+
+
+class MergedFeedPaginator(CursorPaginator):
+    '''Лента подписок, собранная k-way слиянием потоков.
+
+    Посты каждого автора читаются по индексу (author, pub_date, id)
+    порциями и только тогда, когда голова потока оказывается на вершине
+    кучи, поэтому авторы, чьи посты не попадают на страницу, не читаются
+    вовсе. Дополнительные потоки (например, материализованная лента)
+    передаются в extra пагинаторами: из них читается fetch().
+    '''
+
+    def __init__(self, author_ids, per_page, queryset=None, extra=()):
+        super().__init__(author_ids, per_page, POST_ORDERING, model=Post)
+        if queryset is None:
+            queryset = Post.objects.select_related('author', 'group')
+        self.queryset = queryset
+        self.extra = extra
+
+    def _heads(self, key, reverse):
+        '''Граница pub_date каждого автора одним запросом.
+
+        Подзапрос на автора — один шаг по индексу (author, pub_date,
+        id), так что цена зависит от числа подписок, а не от числа их
+        постов, как было бы у GROUP BY. Авторы без постов после key
+        пропускаются.
+        '''
+        posts = Post.objects.filter(author=OuterRef('pk'))
+        if key is not None:
+            posts = posts.filter(self.keyset_filter(key, reverse))
+        ordering = self.reversed_ordering() if reverse else self.ordering
+        bound = Subquery(posts.order_by(*ordering).values('pub_date')[:1])
+        authors = User.objects.filter(pk__in=self.object_list).annotate(
+            bound=bound).values_list('pk', 'bound')
+        return [(author_id, bound) for author_id, bound in authors
+                if bound is not None]
+
+    @staticmethod
+    def _stream(source, key, reverse, chunk):
+        while True:
+            batch = source.fetch(key, reverse, chunk)
+            yield from batch
+            if len(batch) < chunk:
+                return
+            key = (batch[-1].pub_date, batch[-1].id)
+
+    def _author_stream(self, author_id, key, reverse, chunk):
+        # Генератор: queryset и пагинатор строятся при первом next(), то
+        # есть только для авторов, до которых дошла куча.
+        source = CursorPaginator(self.queryset.filter(author_id=author_id),
+                                 chunk, POST_ORDERING)
+        yield from self._stream(source, key, reverse, chunk)
+
+    def fetch(self, key, reverse, limit):
+        descending = not reverse
+        missing_id = float('-inf') if reverse else float('inf')
+        heap = [
+            _Head((bound, missing_id), None,
+                  self._author_stream(author_id, key, reverse, limit),
+                  descending)
+            for author_id, bound in self._heads(key, reverse)
+        ]
+        for source in self.extra:
+            stream = self._stream(source, key, reverse, limit)
+            post = next(stream, None)
+            if post is not None:
+                heap.append(_Head((post.pub_date, post.id), post, stream,
+                                  descending))
+        heapq.heapify(heap)
+        result = []
+        while heap and len(result) < limit:
+            head = heapq.heappop(heap)
+            if head.post is not None:
+                result.append(head.post)
+            post = next(head.stream, None)
+            if post is not None:
+                heapq.heappush(heap, _Head((post.pub_date, post.id), post,
+                                           head.stream, descending))
+        return result
+
+
+def merged_feed(user, per_page):
+    '''Пагинатор ленты, читающий посты авторов без материализации.'''
+    author_ids = Follow.objects.filter(user=user).values('author_id')
+    return MergedFeedPaginator(author_ids, per_page)
+
+
+def hybrid_feed(user, per_page):
+    '''Пагинатор ленты для режима hybrid.
+
+    Возвращает None, если пользователь не подписан ни на одного автора
+    сверх порога: тогда ленту целиком отдаёт материализованная таблица.
+    '''
+    pulled = celebrity_ids()
+    if not pulled:
+        return None
+    author_ids = list(Follow.objects.filter(
+        user=user, author_id__in=pulled).values_list(
+        'author_id', flat=True).distinct())
+    if not author_ids:
+        return None
+    pushed = feed_posts(user).exclude(author_id__in=pulled)
+    return MergedFeedPaginator(author_ids, per_page,
+                               extra=[FeedPaginator(pushed, per_page,
+                                                    user.pk)])
+
+
+def feed_paginator(user, per_page):
+    '''Пагинатор слияния для текущего FEED_MODE или None для push.'''
+    if settings.FEED_MODE == PULL:
+        return merged_feed(user, per_page)
+    if settings.FEED_MODE == HYBRID:
+        return hybrid_feed(user, per_page)
+    return None
@@ -0,0 +1,124 @@
+'''RSS и Atom для главной, групп и профилей.
+
+Элементы ленты — словари из одного values()-запроса: модели не
+создаются, а автор и группа приходят тем же JOIN.
+'''
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import truncatechars
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from .models import Group, Post, User
+from .paginators import POST_ORDERING
+from yatube.settings import FEED_ITEMS
+
+ITEM_FIELDS = ('id', 'text', 'pub_date', 'author__username',
+               'author__first_name', 'author__last_name')
+TITLE_CHARS = 60
+
+
+def items(posts):
+    return list(posts.order_by(*POST_ORDERING).values(
+        *ITEM_FIELDS)[:FEED_ITEMS])
+
+
+class PostsFeed(Feed):
+    '''Общая часть лент: элементы — словари из values().'''
+    title = 'Yatube: последние записи'
+    description = 'Последние обновления на сайте'
+
+    def link(self):
+        return reverse('group_posts:index')
+
+    def items(self):
+        return items(Post.objects.all())
+
+    def item_title(self, item):
+        return truncatechars(item['text'], TITLE_CHARS)
+
+    def item_description(self, item):
+        return item['text']
+
+    def item_link(self, item):
+        return reverse('group_posts:post_detail', args=[item['id']])
+
+    def item_pubdate(self, item):
+        return item['pub_date']
+
+    def item_author_name(self, item):
+        full_name = (f"{item['author__first_name']} "
+                     f"{item['author__last_name']}").strip()
+        return full_name or item['author__username']
+
+    def item_author_link(self, item):
+        return reverse('group_posts:profile',
+                       args=[item['author__username']])
+
+
+class GroupFeed(PostsFeed):
+
+    def get_object(self, request, slug):
+        return get_object_or_404(
+            Group.objects.only('slug', 'title', 'description'), slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('group_posts:group_list', args=[group.slug])
+
+    def items(self, group):
+        return items(Post.objects.filter(group=group))
+
+
+class ProfileFeed(PostsFeed):
+
+    def get_object(self, request, username):
+        return get_object_or_404(
+            User.objects.only('username', 'first_name', 'last_name'),
+            username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('group_posts:profile', args=[author.username])
+
+    def items(self, author):
+        return items(Post.objects.filter(author=author))
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj=None):
+        return self._get_dynamic_attr('description', obj)
+
+
+class PostsAtomFeed(AtomMixin, PostsFeed):
+    pass
+
+
+class GroupAtomFeed(AtomMixin, GroupFeed):
+    pass
+
+
+class ProfileAtomFeed(AtomMixin, ProfileFeed):
+    pass
+
+
+FEEDS = {
+    ('index', 'rss'): PostsFeed(),
+    ('index', 'atom'): PostsAtomFeed(),
+    ('group', 'rss'): GroupFeed(),
+    ('group', 'atom'): GroupAtomFeed(),
+    ('profile', 'rss'): ProfileFeed(),
+    ('profile', 'atom'): ProfileAtomFeed(),
+}
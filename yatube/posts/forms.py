@@ -1,7 +1,9 @@
 
 from django import forms
 
+from . import imaging
 from .models import Comment, Post
+from yatube.settings import IMAGE_MAX_SIDE
 
 
 class PostForm(forms.ModelForm):
@@ -9,6 +11,18 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            # Варианты прежней картинки к новой не относятся.
+            self.instance.image_variants = ''
+            image = self.cleaned_data['image']
+            metadata = None
+            if image:
+                metadata = imaging.describe(image, IMAGE_MAX_SIDE)
+                image.seek(0)
+            self.instance.set_image_metadata(metadata)
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
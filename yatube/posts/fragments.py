@@ -0,0 +1,46 @@
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import thumbnails
+from yatube.settings import CARD_CACHE_TIMEOUT
+
+CARD_TEMPLATE = 'posts/includes/post_list.html'
+
+
+def card_version(post):
+    '''Версия карточки: хэш всего, что попадает в её разметку.'''
+    author = post.author
+    parts = (post.text, post.image.name, post.image_color, post.image_lqip,
+             post.group_id, post.pub_date,
+             author.username, author.first_name, author.last_name)
+    raw = '\x1f'.join(str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def render_cards(posts, template_name=CARD_TEMPLATE):
+    '''Пары (post, html) карточек; готовые берутся одним get_many.
+
+    Ключ содержит id поста и версию содержимого, поэтому правка поста
+    сама уводит карточку на новый ключ, а старая истекает по таймауту.
+    '''
+    posts = list(posts)
+    keys = [
+        f'card:{template_name}:{post.pk}:{card_version(post)}'
+        for post in posts
+    ]
+    found = cache.get_many(keys)
+    missing = [post for key, post in zip(keys, posts) if key not in found]
+    thumbnails.prefetch(missing)
+    rendered = {}
+    for key, post in zip(keys, posts):
+        if key not in found:
+            found[key] = render_to_string(template_name, {'post': post})
+            # Карточку с заглушкой вместо миниатюры не кэшируем.
+            if not getattr(post.image, 'thumbnail_pending', False):
+                rendered[key] = found[key]
+    if rendered:
+        cache.set_many(rendered, CARD_CACHE_TIMEOUT)
+    return [(post, mark_safe(found[key])) for key, post in zip(keys, posts)]
@@ -0,0 +1,175 @@
+'''Обработка загруженных картинок без Django: код выполняется в пуле
+процессов, которые не поднимают приложение и не ходят в БД.'''
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from PIL import Image, ImageOps, features
+
+SAVE_FORMATS = {'jpg': 'JPEG', 'webp': 'WEBP'}
+ORIENTATION = 0x0112
+# Ориентации EXIF, при которых ширина и высота меняются местами.
+TRANSPOSED = (5, 6, 7, 8)
+LQIP_SIDE = 16
+CHUNK_SIZE = 64 * 1024
+
+
+def variant_path(path, width, extension):
+    '''Путь варианта шириной width рядом с оригиналом, в variants/.'''
+    directory, filename = os.path.split(path)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants',
+                        f'{stem}-{width}.{extension}')
+
+
+def available_formats(extensions):
+    '''Расширения вариантов, которые умеет писать установленный Pillow.'''
+    return [
+        extension for extension in extensions
+        if extension != 'webp' or features.check('webp')
+    ]
+
+
+def variant_widths(width, widths):
+    '''Ширины вариантов не больше исходной; сама исходная — всегда.'''
+    return sorted({w for w in widths if w < width} | {width})
+
+
+def _write(image, path, save_format, quality):
+    # Через временный файл: читатель не увидит недописанную картинку.
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            if save_format in ('JPEG', 'WEBP'):
+                image.save(output, save_format, quality=quality,
+                           optimize=save_format == 'JPEG')
+            else:
+                image.save(output, save_format)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _for_format(image, save_format):
+    if save_format == 'JPEG' and image.mode != 'RGB':
+        return image.convert('RGB')
+    if save_format == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'transparency' in image.info
+                             else 'RGB')
+    return image
+
+
+def preview(image):
+    '''Средний цвет и крошечная PNG-превью (LQIP) как data URI.'''
+    small = image.convert('RGB')
+    small.thumbnail((LQIP_SIDE, LQIP_SIDE), Image.BOX)
+    color = '#%02x%02x%02x' % small.resize((1, 1), Image.BOX).getpixel(
+        (0, 0))
+    output = BytesIO()
+    small.save(output, 'PNG', optimize=True)
+    lqip = 'data:image/png;base64,' + base64.b64encode(
+        output.getvalue()).decode()
+    return {'color': color, 'lqip': lqip}
+
+
+def _orientation(image):
+    # getexif() у PNG без eXIf в заголовке декодирует весь файл в
+    # поисках чанка после данных; такие редкие размеры поправит воркер.
+    if image.format == 'PNG' and 'exif' not in image.info:
+        return None
+    return image.getexif().get(ORIENTATION)
+
+
+def describe(file, max_side):
+    '''Размеры картинки такой, какой её сделает process().
+
+    Читается только заголовок: размеры с учётом поворота по EXIF и
+    уменьшения до max_side. Пиксели не декодируются, поэтому вызов
+    годится для запроса с загрузкой; цвет и превью посчитает воркер.
+    '''
+    with Image.open(file) as image:
+        width, height = image.size
+        if _orientation(image) in TRANSPOSED:
+            width, height = height, width
+    scale = min(1, max_side / max(width, height))
+    return {
+        'width': max(1, round(width * scale)),
+        'height': max(1, round(height * scale)),
+    }
+
+
+def summarize(file, max_side):
+    '''describe() вместе с цветом и превью — для офлайн-команд.
+
+    JPEG декодируется в 1/8 масштаба, остальные форматы — целиком.
+    '''
+    metadata = describe(file, max_side)
+    file.seek(0)
+    with Image.open(file) as image:
+        image.draft('RGB', (LQIP_SIDE, LQIP_SIDE))
+        metadata.update(preview(ImageOps.exif_transpose(image)))
+    return metadata
+
+
+def process(path, staging, max_side, widths, extensions, quality):
+    '''Пишет нормализованную копию оригинала и варианты для srcset.
+
+    Поворачивает по EXIF, уменьшает до max_side по большей стороне и
+    пересохраняет без метаданных. JPEG декодируется сразу в уменьшенном
+    масштабе (draft), поэтому многомегапиксельные фото не раскрываются
+    в памяти целиком. Сам оригинал не меняется: его имя — хэш
+    содержимого, и он уже мог быть отдан как неизменяемый. Копия
+    ложится в отдельный каталог внутри staging под именем sha256 своих
+    байтов, варианты — рядом в variants/; перенести их в хранилище —
+    дело вызывающего. Возвращает (путь копии, расширения, ширины,
+    метаданные).
+    '''
+    with Image.open(path) as source:
+        save_format = source.format
+        source.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(source)
+        image.load()
+        image.thumbnail((max_side, max_side), Image.LANCZOS,
+                        reducing_gap=3.0)
+        # Без info: EXIF, ICC, XMP и комментарии не попадут в файл.
+        image.info = {key: value for key, value in image.info.items()
+                      if key == 'transparency'}
+    os.makedirs(staging, exist_ok=True)
+    workdir = tempfile.mkdtemp(dir=staging)
+    try:
+        extension = os.path.splitext(path)[1].lower()
+        normalized = os.path.join(workdir, 'original' + extension)
+        _write(_for_format(image, save_format), normalized, save_format,
+               quality)
+        staged = os.path.join(workdir, _digest(normalized) + extension)
+        os.replace(normalized, staged)
+        extensions = available_formats(extensions)
+        widths = variant_widths(image.width, widths)
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            for extension in extensions:
+                save_format = SAVE_FORMATS[extension]
+                _write(_for_format(resized, save_format),
+                       variant_path(staged, width, extension),
+                       save_format, quality)
+    except BaseException:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    metadata = preview(image)
+    metadata['width'], metadata['height'] = image.size
+    return staged, extensions, widths, metadata
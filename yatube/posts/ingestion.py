@@ -0,0 +1,215 @@
+import logging
+import multiprocessing
+import os
+import posixpath
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.db import connections, transaction
+
+from . import caching, imaging, thumbnails
+from .models import Post
+from yatube.settings import (IMAGE_MAX_SIDE, IMAGE_QUALITY,
+                             IMAGE_VARIANT_FORMATS, IMAGE_VARIANT_WIDTHS,
+                             IMAGE_WORKERS)
+
+logger = logging.getLogger(__name__)
+
+# Каталог хранилища, куда воркеры пишут результат до переноса; он вне
+# MEDIA_PUBLIC_DIRS и вне обхода gc_media.
+STAGING_DIR = 'staging'
+PROCESSED_FIELDS = ('image_variants', 'image_width', 'image_height',
+                    'image_color', 'image_lqip')
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def encode_variants(extensions, widths):
+    return '%s:%s' % (','.join(extensions), ','.join(map(str, widths)))
+
+
+def decode_variants(value):
+    '''(расширения, ширины) из Post.image_variants; пусто — не готово.'''
+    if not value:
+        return [], []
+    extensions, widths = value.split(':')
+    return extensions.split(','), [int(width) for width in widths.split(',')]
+
+
+def srcset(post, extension):
+    '''Значение srcset из вариантов картинки поста или пустая строка.'''
+    extensions, widths = decode_variants(post.image_variants)
+    if extension not in extensions:
+        return ''
+    return ', '.join(
+        '%s %sw' % (post.image.storage.url(
+            imaging.variant_path(post.image.name, width, extension)), width)
+        for width in widths
+    )
+
+
+def executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn, а не fork: форк процесса с потоками может унести
+            # с собой чужие захваченные блокировки.
+            _executor = ProcessPoolExecutor(
+                IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _arguments(post):
+    return (post.image.path, post.image.storage.path(STAGING_DIR),
+            IMAGE_MAX_SIDE, IMAGE_VARIANT_WIDTHS, IMAGE_VARIANT_FORMATS,
+            IMAGE_QUALITY)
+
+
+def _move(source, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(source, target)
+
+
+def publish(post, staged, extensions, widths):
+    '''Переносит результат imaging.process() в хранилище.
+
+    Нормализованный файл получает имя по своему содержимому, как
+    любая загрузка, и совпавший с уже сохранённым не пишется повторно.
+    Возвращает новое имя.
+    '''
+    storage = post.image.storage
+    upload_to = Post._meta.get_field('image').upload_to
+    name = storage.content_name(
+        posixpath.join(upload_to, os.path.basename(staged)),
+        os.path.splitext(os.path.basename(staged))[0])
+    if storage.exists(name):
+        os.utime(storage.path(name))
+    else:
+        _move(staged, storage.path(name))
+    for width in widths:
+        for extension in extensions:
+            _move(imaging.variant_path(staged, width, extension),
+                  storage.path(imaging.variant_path(name, width, extension)))
+    return name
+
+
+def finish(post, staged, extensions, widths, metadata):
+    '''Публикует обработанный оригинал и строит миниатюры уже из него.
+
+    Прежний файл не переписывается: его адрес неизменяемый, и
+    закэшированные копии остаются верными. Посты переходят на новое
+    имя, а старый файл, оставшись без ссылок, уберёт gc_media.
+    '''
+    try:
+        original = post.image.name
+        post.image.name = publish(post, staged, extensions, widths)
+    finally:
+        shutil.rmtree(os.path.dirname(staged), ignore_errors=True)
+    post.image_variants = encode_variants(extensions, widths)
+    post.set_image_metadata(metadata)
+    # update(), а не save(): это не правка поста, сигналы не нужны.
+    # Посты с тем же файлом получают тот же результат.
+    Post.objects.filter(image=original).update(image=post.image.name, **{
+        field: getattr(post, field) for field in PROCESSED_FIELDS
+    })
+    caching.post_changed(post)
+    thumbnails.schedule(post)
+
+
+def process_post(post):
+    '''Обработка картинки поста в текущем процессе.'''
+    finish(post, *imaging.process(*_arguments(post)))
+
+
+def _copy_from_twin(post):
+    '''Берёт результат обработки у поста с тем же файлом, если он есть.
+
+    Одинаковые загрузки хранилище сводит к одному файлу, и если он уже
+    обработан, повторная обработка лишь пережала бы его ещё раз: так
+    бывает, когда снова загружают отданный сайтом файл.
+    '''
+    twins = Post.objects.filter(image=post.image.name).exclude(
+        image_variants='').exclude(pk=post.pk)
+    twin = twins.values(*PROCESSED_FIELDS).first()
+    if twin is None:
+        return False
+    for field, value in twin.items():
+        setattr(post, field, value)
+    Post.objects.filter(pk=post.pk).update(**twin)
+    caching.post_changed(post)
+    thumbnails.schedule(post)
+    return True
+
+
+def _release(name):
+    with _lock:
+        _pending.discard(name)
+
+
+def _done(post, name, future):
+    global _executor
+    try:
+        finish(post, *future.result())
+    except Exception as error:
+        logger.exception('Не удалось обработать %s', name)
+        if isinstance(error, BrokenProcessPool):
+            with _lock:
+                _executor = None
+        thumbnails.schedule(post)
+    finally:
+        _release(name)
+        connections.close_all()
+
+
+def ensure_derived(post):
+    '''Ставит недостающее: миниатюры — только после нормализации.'''
+    if post.image_variants:
+        thumbnails.schedule(post)
+    else:
+        schedule(post)
+
+
+def _submit(post):
+    '''Future обработки или None, если делать нечего.'''
+    if _copy_from_twin(post):
+        return None
+    if not thumbnails.source_exists(post.image):
+        logger.warning('Нет файла %s для обработки', post.image.name)
+        return None
+    return executor().submit(imaging.process, *_arguments(post))
+
+
+def schedule(post):
+    '''Отправляет картинку поста в пул процессов после коммита.
+
+    Воркер нормализует оригинал и пишет варианты, а по завершении
+    ставятся миниатюры: так они строятся уже из обработанного файла,
+    и по неизменяемому адресу миниатюры не окажется другое содержимое.
+    Файл, который уже обрабатывается, второй раз не ставится: страницы
+    с заглушкой вызывают schedule на каждом показе.
+    '''
+    name = post.image.name
+    if not name:
+        return
+
+    def submit():
+        with _lock:
+            if name in _pending:
+                return
+            _pending.add(name)
+        try:
+            future = _submit(post)
+        except Exception:
+            _release(name)
+            raise
+        if future is None:
+            _release(name)
+        else:
+            future.add_done_callback(partial(_done, post, name))
+    transaction.on_commit(submit)
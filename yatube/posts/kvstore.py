@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from yatube.settings import THUMBNAIL_LRU_SIZE, THUMBNAIL_LRU_TIMEOUT
+
+EMPTY_VALUE = cached_db_kvstore.EMPTY_VALUE
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    '''KV-хранилище sorl с пакетным get_many и LRU в памяти процесса.
+
+    В LRU попадают только найденные записи и лишь на
+    THUMBNAIL_LRU_TIMEOUT секунд: удаление миниатюры в другом процессе
+    сюда не доходит, поэтому память не должна быть вечной.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recall(self, key):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return value
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._lru[key] = (value, time.monotonic() + THUMBNAIL_LRU_TIMEOUT)
+            self._lru.move_to_end(key)
+            while len(self._lru) > THUMBNAIL_LRU_SIZE:
+                self._lru.popitem(last=False)
+
+    def clear_lru(self):
+        with self._lock:
+            self._lru.clear()
+
+    def _get_raw(self, key):
+        value = self._recall(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None:
+                self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        with self._lock:
+            for key in keys:
+                self._lru.pop(key, None)
+
+    def get_many(self, image_files):
+        '''Записи для image_files списком того же порядка, None — нет записи.
+
+        Всё, чего нет в LRU, ищется одним get_many кэша, а промахи кэша —
+        одним запросом к БД.
+        '''
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        found = self._get_many_raw(keys)
+        return [
+            deserialize_image_file(found[key]) if key in found else None
+            for key in keys
+        ]
+
+    def _get_many_raw(self, keys):
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            value = self._recall(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if not missing:
+            return found
+        cached = self.cache.get_many(missing)
+        absent = [key for key in missing if key not in cached]
+        if absent:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=absent).values_list('key', 'value'))
+            # Отсутствие запоминаем так же, как _get_raw родителя.
+            self.cache.set_many(
+                {key: stored.get(key, EMPTY_VALUE) for key in absent},
+                sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            cached.update(stored)
+        for key, value in cached.items():
+            if value != EMPTY_VALUE and value:
+                found[key] = value
+                self._remember(key, value)
+        return found
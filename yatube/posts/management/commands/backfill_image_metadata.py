@@ -0,0 +1,41 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts import caching, imaging
+from posts.models import Post
+from yatube.settings import IMAGE_MAX_SIDE
+
+BATCH_SIZE = 500
+FIELDS = ('image_width', 'image_height', 'image_color', 'image_lqip')
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры, цвет и превью картинок существующих постов.'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_width__isnull=True).only(
+            'id', 'image', 'author_id', 'group_id')
+        batch = []
+        filled = 0
+        for post in posts.iterator():
+            try:
+                with default_storage.open(post.image.name) as image:
+                    post.set_image_metadata(
+                        imaging.summarize(image, IMAGE_MAX_SIDE))
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'{post.image.name}: {error}')
+                continue
+            batch.append(post)
+            if len(batch) >= BATCH_SIZE:
+                filled += self.save(batch)
+                batch = []
+        filled += self.save(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено картинок: {filled}'))
+
+    def save(self, posts):
+        Post.objects.bulk_update(posts, FIELDS)
+        for post in posts:
+            caching.post_changed(post)
+        return len(posts)
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты и комментарии пользователя или группы '
+            'потоком в NDJSON или CSV.')
+
+    def add_arguments(self, parser):
+        scope = parser.add_mutually_exclusive_group(required=True)
+        scope.add_argument('--user', help='username автора.')
+        scope.add_argument('--group', help='slug группы.')
+        parser.add_argument(
+            '--format', choices=sorted(export.FORMATS), default=export.NDJSON)
+        parser.add_argument(
+            '--gzip', action='store_true', help='Сжимать на лету.')
+        parser.add_argument(
+            '--output', default='-', help='Файл; «-» — стандартный вывод.')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {options["user"]}')
+            records = export.user_records(user)
+        else:
+            group = Group.objects.filter(slug=options['group']).first()
+            if group is None:
+                raise CommandError(f'Нет группы {options["group"]}')
+            records = export.group_records(group)
+        chunks = export.stream(records, options['format'], options['gzip'])
+        if options['output'] == '-':
+            output = sys.stdout.buffer
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.feed import celebrities
+
+
+class Command(BaseCommand):
+    help = ('Показывает авторов, чьи посты не рассылаются по лентам, '
+            'а подмешиваются при чтении (режим hybrid).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=int,
+            default=settings.FEED_PUSH_FOLLOWER_LIMIT,
+            help='Порог числа подписчиков.')
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+        rows = celebrities(threshold).values_list('user__username',
+                                                  'followers_count')
+        total = 0
+        for username, followers in rows.iterator():
+            self.stdout.write(f'{username}\t{followers}')
+            total += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов сверх порога {threshold}: {total}'))
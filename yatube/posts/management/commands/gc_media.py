@@ -0,0 +1,88 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import media_gc
+from yatube.settings import (GC_MEDIA_BATCH_SIZE, GC_MEDIA_CHECKPOINT,
+                             GC_MEDIA_GRACE, GC_MEDIA_RATE)
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки, на которые не ссылается ни один пост, '
+            'вместе с их вариантами и миниатюрами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.')
+        parser.add_argument(
+            '--batch-size', type=int, default=GC_MEDIA_BATCH_SIZE,
+            help='Файлов между сохранениями точки продолжения.')
+        parser.add_argument(
+            '--rate', type=float, default=GC_MEDIA_RATE,
+            help='Удалений в секунду; 0 — без ограничения.')
+        parser.add_argument(
+            '--grace', type=int, default=GC_MEDIA_GRACE,
+            help='Файлы моложе стольких секунд не трогать.')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать обход заново, забыв точку продолжения.')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.limiter = media_gc.RateLimiter(options['rate'])
+        self.orphans = self.freed = 0
+        if options['restart'] and os.path.exists(GC_MEDIA_CHECKPOINT):
+            os.remove(GC_MEDIA_CHECKPOINT)
+        # Пробный прогон всегда смотрит всё и не двигает точку.
+        checkpoint = () if self.dry_run else self.load_checkpoint()
+        names, stems = media_gc.referenced()
+        cutoff = time.time() - options['grace']
+        storage = media_gc.image_storage()
+        scanned = 0
+        batch = []
+        files = media_gc.walk(storage.location, checkpoint,
+                              (media_gc.upload_root(),))
+        for media_file in files:
+            scanned += 1
+            if (media_file.mtime < cutoff
+                    and media_gc.is_orphan(media_file, names, stems)):
+                batch.append(media_file)
+            if scanned % options['batch_size'] == 0:
+                self.collect(batch)
+                batch = []
+                self.save_checkpoint(media_file.name)
+        self.collect(batch)
+        if not self.dry_run and os.path.exists(GC_MEDIA_CHECKPOINT):
+            os.remove(GC_MEDIA_CHECKPOINT)
+        action = 'Можно удалить' if self.dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено файлов: {scanned}. {action}: {self.orphans} '
+            f'({self.freed} байт).'))
+
+    def collect(self, batch):
+        for media_file in media_gc.still_unreferenced(batch):
+            if self.dry_run:
+                self.stdout.write(f'{media_file.name}\t{media_file.size}')
+            else:
+                self.limiter.wait()
+                media_gc.delete(media_file)
+            self.orphans += 1
+            self.freed += media_file.size
+
+    def load_checkpoint(self):
+        try:
+            with open(GC_MEDIA_CHECKPOINT) as checkpoint:
+                name = checkpoint.read().strip()
+        except FileNotFoundError:
+            return ()
+        return tuple(name.split('/')) if name else ()
+
+    def save_checkpoint(self, name):
+        if self.dry_run:
+            return
+        temporary = GC_MEDIA_CHECKPOINT + '.tmp'
+        with open(temporary, 'w') as checkpoint:
+            checkpoint.write(name)
+        os.replace(temporary, GC_MEDIA_CHECKPOINT)
@@ -0,0 +1,58 @@
+import gzip
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.bulk_import import Importer, InvalidRecord
+from yatube.settings import IMPORT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Импортирует пользователей, группы, посты, комментарии и '
+            'подписки из JSONL пачками bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл .jsonl или .jsonl.gz; «-» — стандартный ввод.')
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Записей в одной транзакции.')
+        parser.add_argument(
+            '--skip-orphans', action='store_true',
+            help='Пропускать комментарии к постам, которых нет ни в файле, '
+                 'ни в базе, — например, в выгрузке пользователя.')
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8')
+        return open(path, encoding='utf-8')
+
+    def handle(self, *args, **options):
+        importer = Importer(options['batch_size'], options['skip_orphans'])
+        try:
+            with self.open(options['path']) as lines:
+                for _ in importer.read(lines):
+                    if options['verbosity'] > 1:
+                        self.stdout.write(
+                            f'{importer.total} записей, '
+                            f'{importer.rate():.0f} в секунду')
+        except (InvalidRecord, IntegrityError, OSError) as error:
+            # Сброшенные пачки уже в базе: им тоже нужны счётчики и индексы.
+            importer.finish()
+            raise CommandError(
+                f'{error}. Уже импортировано записей: {importer.total}.')
+        rate = importer.rate()
+        importer.finish()
+        summary = ', '.join(f'{kind}: {count}' for kind, count
+                            in sorted(importer.counts.items()))
+        if importer.skipped:
+            summary += '; пропущено ' + ', '.join(
+                f'{kind}: {count}' for kind, count
+                in sorted(importer.skipped.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано {importer.total} записей ({summary}), '
+            f'{rate:.0f} в секунду. Счётчики, поиск и ленты пересобраны.'))
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+from yatube.settings import THUMBNAIL_WORKERS
+
+CHUNK_SIZE = 500
+
+
+def generate(post):
+    try:
+        return thumbnails.generate_for_post(post)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры всех постов с картинками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=THUMBNAIL_WORKERS,
+            help='Потоков генерации; 0 — в текущем потоке.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only(
+            'id', 'image', 'author_id', 'group_id').iterator()
+        created = 0
+        with ExitStack() as stack:
+            if options['workers'] > 0:
+                pool = stack.enter_context(
+                    ThreadPoolExecutor(options['workers']))
+                run = partial(pool.map, generate)
+            else:
+                run = partial(map, thumbnails.generate_for_post)
+            # Пачками, чтобы не держать в памяти фьючерсы на все посты.
+            while True:
+                chunk = list(islice(posts, CHUNK_SIZE))
+                if not chunk:
+                    break
+                created += sum(run(chunk))
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано миниатюр: {created}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import ingestion
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает картинки постов, у которых ещё нет вариантов.'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_variants='').only('id', 'image', 'author_id', 'group_id')
+        processed = 0
+        for post in posts.iterator():
+            try:
+                ingestion.process_post(post)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'{post.image.name}: {error}')
+            else:
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {processed}'))
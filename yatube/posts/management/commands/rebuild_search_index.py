@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов.'
+
+    def handle(self, *args, **options):
+        indexed = search.engine().rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {indexed}'))
@@ -0,0 +1,125 @@
+import os
+import posixpath
+import time
+from collections import namedtuple
+
+from django.core.files.storage import default_storage
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+
+VARIANTS_DIR = 'variants'
+
+MediaFile = namedtuple('MediaFile', 'name path size mtime')
+
+
+def image_storage():
+    return Post._meta.get_field('image').storage
+
+
+def upload_root():
+    return Post._meta.get_field('image').upload_to.strip('/')
+
+
+def stem(name):
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, os.path.splitext(filename)[0])
+
+
+def referenced():
+    '''Имена картинок постов и «стебли» для сверки вариантов srcset.'''
+    names = set()
+    stems = set()
+    images = Post.objects.exclude(image='').values_list('image', flat=True)
+    for name in images.iterator():
+        names.add(name)
+        stems.add(stem(name))
+    return names, stems
+
+
+def variant_source_stem(name):
+    '''Стебель оригинала для dir/variants/<stem>-<ширина>.<ext>, иначе None.'''
+    directory, filename = posixpath.split(name)
+    if posixpath.basename(directory) != VARIANTS_DIR:
+        return None
+    base = os.path.splitext(filename)[0].rpartition('-')[0]
+    if not base:
+        return None
+    return posixpath.join(posixpath.dirname(directory), base)
+
+
+def walk(root, checkpoint=(), parts=()):
+    '''Потоково обходит каталог в отсортированном порядке.
+
+    Порядок — лексикографический по кортежу частей пути, поэтому с
+    checkpoint (части пути последнего обработанного файла) обход
+    продолжается с места остановки, пропуская целые каталоги.
+    '''
+    directory = os.path.join(root, *parts)
+    try:
+        entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        path_parts = parts + (entry.name,)
+        if entry.is_dir(follow_symlinks=False):
+            if checkpoint and path_parts < checkpoint[:len(path_parts)]:
+                continue
+            yield from walk(root, checkpoint, path_parts)
+        elif entry.is_file(follow_symlinks=False):
+            if checkpoint and path_parts <= checkpoint:
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            yield MediaFile('/'.join(path_parts), entry.path, stat.st_size,
+                            stat.st_mtime)
+
+
+def is_orphan(media_file, names, stems):
+    source = variant_source_stem(media_file.name)
+    if source is not None:
+        return source not in stems
+    return media_file.name not in names
+
+
+def still_unreferenced(orphans):
+    '''Отсекает файлы, на которые сослались после загрузки множества.'''
+    names = [media_file.name for media_file in orphans]
+    fresh = set(Post.objects.filter(image__in=names).values_list(
+        'image', flat=True))
+    return [
+        media_file for media_file in orphans
+        if media_file.name not in fresh
+    ]
+
+
+def delete(media_file):
+    '''Удаляет файл и, для оригинала, его миниатюры и записи sorl.'''
+    if variant_source_stem(media_file.name) is None:
+        # Ключ миниатюр включает хранилище: старые строились через
+        # хранилище по умолчанию, новые — через адресное по содержимому.
+        for storage in {image_storage(), default_storage}:
+            default.kvstore.delete(ImageFile(media_file.name, storage))
+    try:
+        os.remove(media_file.path)
+    except FileNotFoundError:
+        pass
+
+
+class RateLimiter:
+    '''Не больше rate вызовов wait() в секунду; 0 — без ограничения.'''
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1 / rate if rate else 0
+        self.clock = clock
+        self.sleep = sleep
+        self.next_at = clock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = self.clock()
+        if now < self.next_at:
+            self.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
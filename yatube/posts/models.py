@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
 from django.db import models
 
+from core.storage import ContentAddressedStorage
 from yatube.settings import FIFTEEN_CHARACTERS, TWO_HUNDRED_CHARACTERS
 
 User = get_user_model()
@@ -23,13 +24,44 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         help_text='Выберите картинку'
     )
+    image_variants = models.CharField('Варианты картинки', max_length=100,
+                                      blank=True, editable=False)
+    image_width = models.PositiveIntegerField('Ширина картинки', null=True,
+                                              blank=True, editable=False)
+    image_height = models.PositiveIntegerField('Высота картинки', null=True,
+                                               blank=True, editable=False)
+    image_color = models.CharField('Средний цвет картинки', max_length=7,
+                                   blank=True, editable=False)
+    image_lqip = models.TextField('Превью картинки', blank=True,
+                                  editable=False)
+    comments_count = models.PositiveIntegerField('Число комментариев',
+                                                 default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pub_date', 'id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['author', 'pub_date', 'id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date', 'id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text
 
+    def set_image_metadata(self, metadata=None):
+        '''Заполняет поля image_* из словаря imaging; None — очищает.'''
+        metadata = metadata or {}
+        self.image_width = metadata.get('width')
+        self.image_height = metadata.get('height')
+        self.image_color = metadata.get('color', '')
+        self.image_lqip = metadata.get('lqip', '')
+
 
 class Group(models.Model):
     '''Созадние модели таблицы групп.'''
@@ -59,6 +91,12 @@ class Comment(models.Model):
 
     created = models.DateTimeField(auto_now_add=True, db_index=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -68,3 +106,33 @@ class Follow(models.Model):
                              related_name='follower')
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='following')
+
+
+class FeedEntry(models.Model):
+    '''Материализованная лента подписок: пост, доставленный подписчику.'''
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='feed')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    pub_date = models.DateTimeField('Дата создания поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post'],
+                         name='feed_user_pub_date_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    '''Денормализованные счётчики пользователя.'''
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField('Число подписчиков',
+                                                  default=0, db_index=True)
+    following_count = models.PositiveIntegerField('Число подписок',
+                                                  default=0)
@@ -0,0 +1,167 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+CURSOR_PARAM = 'cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+POST_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('-created', '-id')
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, values):
+    '''Упаковывает направление и значения ключа в непрозрачный токен.'''
+    raw = json.dumps([direction, list(values)], default=str,
+                     separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    '''Распаковывает токен, созданный encode_cursor.'''
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(token)
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        raise InvalidCursor(token)
+    return direction, values
+
+
+class CursorPage(Sequence):
+    '''Страница курсорной пагинации с токенами соседних страниц.'''
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<CursorPage: %s objects>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @cached_property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.cursor_for(NEXT, self.object_list[-1])
+
+    @cached_property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.cursor_for(PREVIOUS, self.object_list[0])
+
+
+class CursorPaginator:
+    '''Keyset-пагинация без COUNT(*) и OFFSET.
+
+    Страница выбирается условием по ключу сортировки (по умолчанию
+    ``(pub_date, id)``), поэтому стоимость запроса не зависит от глубины.
+    '''
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=POST_ORDERING,
+                 model=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.model = model or object_list.model
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+
+    def key_for(self, item):
+        '''Значения ключа сортировки у объекта или словаря values().'''
+        if isinstance(item, dict):
+            return [item[name] for name, _ in self.fields]
+        return [getattr(item, name) for name, _ in self.fields]
+
+    def cursor_for(self, direction, item):
+        return encode_cursor(direction, self.key_for(item))
+
+    def key_field(self, name):
+        try:
+            return self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return self.object_list.query.annotations[name].output_field
+
+    def parse_key(self, values):
+        if len(values) != len(self.fields):
+            raise InvalidCursor(values)
+        try:
+            return [
+                self.key_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise InvalidCursor(values)
+
+    def keyset_filter(self, key, reverse=False):
+        '''Q-условие «строго после key» в порядке сортировки.'''
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.fields, key):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def reversed_ordering(self):
+        return tuple(
+            name if descending else '-' + name
+            for name, descending in self.fields
+        )
+
+    def fetch(self, key, reverse, limit):
+        '''Возвращает до limit объектов после key в нужном направлении.'''
+        queryset = self.object_list
+        if key is not None:
+            queryset = queryset.filter(self.keyset_filter(key, reverse))
+        ordering = self.reversed_ordering() if reverse else self.ordering
+        return list(queryset.order_by(*ordering)[:limit])
+
+    def page(self, cursor=None):
+        direction, key = NEXT, None
+        if cursor:
+            direction, values = decode_cursor(cursor)
+            key = self.parse_key(values)
+        reverse = direction == PREVIOUS
+        items = self.fetch(key, reverse, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if reverse:
+            items.reverse()
+            return CursorPage(items, self, True, has_more)
+        return CursorPage(items, self, has_more, key is not None)
+
+    def get_page(self, cursor=None):
+        '''Как page(), но битый курсор ведёт на первую страницу.'''
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
@@ -0,0 +1,198 @@
+import html
+import re
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .paginators import POST_ORDERING, CursorPaginator
+
+SEARCH_PARAM = 'q'
+FTS_TABLE = 'posts_post_fts'
+MAX_TERMS = 10
+SNIPPET_TOKENS = 32
+ELLIPSIS = '…'
+# Управляющие символы не встречаются в тексте постов: ими snippet()
+# размечает совпадения, а экранируется уже готовая строка.
+MARK_OPEN = '\x02'
+MARK_CLOSE = '\x03'
+
+TERM_RE = re.compile(r'\w+')
+
+
+def terms(query):
+    '''Слова запроса без синтаксиса FTS: пользователь пишет обычный текст.'''
+    return TERM_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def mark(text):
+    '''Экранирует текст и превращает маркеры совпадений в <mark>.'''
+    escaped = html.escape(text)
+    return escaped.replace(MARK_OPEN, '<mark>').replace(MARK_CLOSE, '</mark>')
+
+
+class FTS5Paginator(CursorPaginator):
+    '''Курсорная пагинация выдачи FTS5 по ключу (rank, id).
+
+    rank — bm25, чем меньше, тем релевантнее. Следующая страница
+    выбирается условием по ключу, а не OFFSET.
+    '''
+
+    def __init__(self, match, per_page):
+        super().__init__(Post.objects.none(), per_page, ('rank', '-id'),
+                         model=Post)
+        self.match = match
+
+    def key_field(self, name):
+        if name == 'rank':
+            return FloatField()
+        return super().key_field(name)
+
+    def fetch(self, key, reverse, limit):
+        where = [f'{FTS_TABLE} MATCH %s']
+        params = [self.match]
+        if key is not None:
+            rank, post_id = key
+            rank_op, id_op = ('<', '>') if reverse else ('>', '<')
+            where.append(f'(rank {rank_op} %s OR '
+                         f'(rank = %s AND rowid {id_op} %s))')
+            params += [rank, rank, post_id]
+        order = 'rank DESC, rowid' if reverse else 'rank, rowid DESC'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, rank, snippet({FTS_TABLE}, 0, %s, %s, %s, '
+                f'%s) FROM {FTS_TABLE} WHERE {" AND ".join(where)} '
+                f'ORDER BY {order} LIMIT %s',
+                [MARK_OPEN, MARK_CLOSE, ELLIPSIS, SNIPPET_TOKENS,
+                 *params, limit])
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [row[0] for row in rows])
+        found = []
+        for post_id, rank, snippet in rows:
+            post = posts.get(post_id)
+            if post is not None:
+                post.rank = rank
+                post.snippet = mark(snippet)
+                found.append(post)
+        return found
+
+
+class FTS5SearchEngine:
+    '''Поиск по индексу FTS5 SQLite с ранжированием bm25.
+
+    Индекс — отдельная таблица с копией текста и rowid = id поста:
+    его можно обновлять по id из сигналов, не зная прежнего текста.
+    Триггеры не используются: SQLite-миграции Django пересоздают
+    posts_post и молча удалили бы их.
+    '''
+
+    def match(self, query):
+        words = terms(query)
+        if not words:
+            return None
+        # Последнее слово — префикс: поиск работает при наборе.
+        quoted = [f'"{word}"' for word in words]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def paginator(self, query, per_page):
+        match = self.match(query)
+        if match is None:
+            return None
+        return FTS5Paginator(match, per_page)
+
+    def filter(self, queryset, query):
+        match = self.match(query)
+        if match is None:
+            return queryset
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [match]))
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text])
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table}')
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+            cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+            return cursor.fetchone()[0]
+
+
+class LikePaginator(CursorPaginator):
+    '''Выдача LIKE-поиска: по свежести, с подсветкой в Python.'''
+
+    def __init__(self, queryset, words, per_page):
+        super().__init__(queryset, per_page, POST_ORDERING)
+        self.pattern = re.compile(
+            '|'.join(re.escape(word) for word in words), re.IGNORECASE)
+
+    def fetch(self, key, reverse, limit):
+        posts = super().fetch(key, reverse, limit)
+        for post in posts:
+            post.rank = None
+            post.snippet = mark(self.pattern.sub(
+                lambda found: MARK_OPEN + found.group() + MARK_CLOSE,
+                post.text))
+        return posts
+
+
+class LikeSearchEngine:
+    '''Запасной поиск через icontains для баз без FTS5.
+
+    Интерфейс тот же, что у FTS5SearchEngine, но без индекса: каждый
+    запрос просматривает таблицу, а выдача упорядочена по свежести.
+    '''
+
+    def paginator(self, query, per_page):
+        words = terms(query)
+        if not words:
+            return None
+        queryset = self.filter(
+            Post.objects.select_related('author', 'group'), query)
+        return LikePaginator(queryset, words, per_page)
+
+    def filter(self, queryset, query):
+        condition = Q()
+        for word in terms(query):
+            condition &= Q(text__icontains=word)
+        return queryset.filter(condition)
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+@lru_cache(maxsize=None)
+def _has_fts_table(alias):
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def engine():
+    '''FTS5, если индекс создан миграцией, иначе запасной LIKE-поиск.'''
+    if connection.vendor == 'sqlite' and _has_fts_table(connection.alias):
+        return FTS5SearchEngine()
+    return LikeSearchEngine()
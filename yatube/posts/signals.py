@@ -0,0 +1,71 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import caching, counters, feed, search
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Через __dict__, чтобы не подгружать отложенное поле.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+def deliver_post(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.author_id, 'posts_count', 1)
+        feed.fan_out(instance)
+    search.engine().index(instance)
+    caching.post_changed(instance, instance._loaded_group_id)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def forget_post(sender, instance, **kwargs):
+    counters.bump(instance.author_id, 'posts_count', -1)
+    search.engine().remove(instance.pk)
+    caching.post_changed(instance, instance._loaded_group_id)
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    caching.bump(f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+    caching.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+    caching.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.author_id, 'followers_count', 1)
+        counters.bump(instance.user_id, 'following_count', 1)
+        feed.followers_changed(instance.author_id, 1)
+        feed.backfill(instance.user_id, instance.author_id)
+    caching.bump(f'author:{instance.author_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def trim_feed(sender, instance, **kwargs):
+    counters.bump(instance.author_id, 'followers_count', -1)
+    counters.bump(instance.user_id, 'following_count', -1)
+    feed.trim(instance.user_id, instance.author_id)
+    feed.followers_changed(instance.author_id, -1)
+    caching.bump(f'author:{instance.author_id}')
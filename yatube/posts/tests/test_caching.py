@@ -0,0 +1,216 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..caching import group_scopes, post_scopes
+from ..models import Comment, Follow, Group, Post
+
+
+class GenerationCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cached')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cache-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(author=cls.user, text='Первый пост',
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assertCachedUntil(self, url, write, text):
+        """Страница берётся из кэша, пока write не изменит данные."""
+        self.client.get(url)
+        self.assertIsNone(self.client.get(url).context)
+        write()
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, text)
+
+    def test_new_post_refreshes_lists(self):
+        """Новый пост сразу виден на главной, в группе и в профиле."""
+        urls = [
+            reverse('group_posts:index'),
+            reverse('group_posts:group_list',
+                    kwargs={'slug': self.group.slug}),
+            reverse('group_posts:profile',
+                    kwargs={'username': self.user.username}),
+        ]
+        for number, url in enumerate(urls):
+            with self.subTest(url=url):
+                text = f'Свежий пост {number}'
+                self.assertCachedUntil(url, lambda: Post.objects.create(
+                    author=self.user, text=text, group=self.group), text)
+
+    def test_comment_refreshes_post_detail(self):
+        """Новый комментарий сразу виден на странице поста."""
+        url = reverse('group_posts:post_detail',
+                      kwargs={'post_id': self.post.id})
+        self.assertCachedUntil(url, lambda: Comment.objects.create(
+            post=self.post, author=self.reader, text='Свежий комментарий'),
+            'Свежий комментарий')
+
+    def test_group_change_refreshes_old_group(self):
+        """Перенос поста в другую группу обновляет прежнюю группу."""
+        url = reverse('group_posts:group_list',
+                      kwargs={'slug': self.group.slug})
+        self.client.get(url)
+
+        def move():
+            post = Post.objects.get(pk=self.post.pk)
+            post.group = self.other_group
+            post.save()
+        move()
+        response = self.client.get(url)
+        self.assertNotContains(response, self.post.text)
+
+    def test_follow_refreshes_profile(self):
+        """Подписка сразу меняет кнопку в профиле автора."""
+        url = reverse('group_posts:profile',
+                      kwargs={'username': self.user.username})
+        self.assertCachedUntil(url, lambda: Follow.objects.create(
+            user=self.reader, author=self.user), 'Отписаться')
+
+    def test_pages_are_cached_per_user(self):
+        """Закэшированная страница не отдаётся другому пользователю."""
+        url = reverse('group_posts:index')
+        self.client.get(url)
+        response = Client().get(url)
+        self.assertIsNotNone(response.context)
+
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='etag-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(author=cls.user, text='Пост',
+                                       group=cls.group)
+        cls.urls = [
+            reverse('group_posts:group_list',
+                    kwargs={'slug': cls.group.slug}),
+            reverse('group_posts:profile',
+                    kwargs={'username': cls.user.username}),
+            reverse('group_posts:post_detail',
+                    kwargs={'post_id': cls.post.id}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_not_modified_skips_view(self):
+        """Повтор с тем же ETag — 304 без рендера и с одним запросом."""
+        self.client = Client()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                etag = response['ETag']
+                self.assertIn('no-cache', response['Cache-Control'])
+                self.assertIn('private', response['Cache-Control'])
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertIsNone(response.context)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(len(queries), 1)
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост, комментарий или другой зритель меняют ETag."""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Post.objects.create(author=self.user, text='Ещё', group=self.group)
+        Comment.objects.create(post=self.post, author=self.reader, text='-')
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_changed_is_latest_activity(self):
+        """Время изменения — последний пост группы или комментарий."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='-')
+        self.assertEqual(post_scopes(self.post.id).changed, comment.created)
+        self.assertEqual(group_scopes(self.group.slug).changed,
+                         self.post.pub_date)
+        self.assertIsNone(post_scopes(0))
+
+
+class CsrfCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='csrf')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.url = reverse('group_posts:post_detail',
+                          kwargs={'post_id': cls.post.id})
+        cls.comment_url = reverse('group_posts:add_comment',
+                                  kwargs={'post_id': cls.post.id})
+
+    def setUp(self):
+        cache.clear()
+
+    def browser(self, session_key=None):
+        client = Client(enforce_csrf_checks=True)
+        if session_key is None:
+            client.force_login(self.user)
+        else:
+            client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        return client
+
+    def comment(self, client, text):
+        response = client.get(self.url)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"',
+                          response.content.decode()).group(1)
+        return client.post(self.comment_url, {
+            'text': text, 'csrfmiddlewaretoken': token})
+
+    def test_cached_page_token_matches_cookie(self):
+        """Форма из кэша принимается и у браузера с другой CSRF-cookie."""
+        first = self.browser()
+        first.get(self.url)
+        second = self.browser(
+            first.cookies[settings.SESSION_COOKIE_NAME].value)
+        self.assertEqual(self.comment(second, 'Второй').status_code, 302)
+        self.assertEqual(self.comment(first, 'Первый').status_code, 302)
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 2)
+
+    def test_new_cookie_changes_etag(self):
+        """ETag зависит от CSRF-cookie: 304 не оставит старый токен."""
+        first = self.browser()
+        first.get(self.url)
+        etag = first.get(self.url)['ETag']
+        second = self.browser(
+            first.cookies[settings.SESSION_COOKIE_NAME].value)
+        response = second.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..caching import generations
+from ..models import Comment, Post
+
+
+@mock.patch('posts.views.COMMENTS_PAGE', 3)
+class CommentPaginationTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.user, text='Обсуждаемый')
+        for number in range(5):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий {number}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_post_detail_shows_latest_page(self):
+        """На странице поста — последние комментарии и кнопка «ещё»."""
+        response = self.client.get(reverse(
+            'group_posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(self.texts(comments), [
+            'Комментарий 4', 'Комментарий 3', 'Комментарий 2'])
+        self.assertContains(response, '<span data-comments-count>5</span>')
+        self.assertContains(response, 'data-load-comments')
+
+    def test_load_more_returns_older_fragment(self):
+        """Фрагмент «ещё» продолжает с курсора и без обёртки страницы."""
+        response = self.client.get(reverse(
+            'group_posts:post_detail', kwargs={'post_id': self.post.id}))
+        cursor = response.context['comments'].next_cursor
+        response = self.client.get(
+            reverse('group_posts:post_comments',
+                    kwargs={'post_id': self.post.id}),
+            {'cursor': cursor})
+        self.assertEqual(self.texts(response.context['comments']), [
+            'Комментарий 1', 'Комментарий 0'])
+        self.assertNotContains(response, 'data-load-comments')
+        self.assertNotContains(response, '<html')
+
+    def test_missing_post_comments_not_found(self):
+        """Фрагмент комментариев несуществующего поста — 404."""
+        response = self.client.get(reverse(
+            'group_posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+
+class AjaxCommentTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='ajax')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.url = reverse('group_posts:add_comment',
+                          kwargs={'post_id': cls.post.id})
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def post_comment(self, text, **headers):
+        return self.client.post(self.url, {'text': text},
+                                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+                                **headers)
+
+    def test_fragment_with_new_comment(self):
+        """Скрипт получает 201 и разметку одного нового комментария."""
+        response = self.post_comment('Быстрый ответ')
+        self.assertEqual(response.status_code, 201)
+        self.assertContains(response, 'Быстрый ответ', status_code=201)
+        self.assertNotContains(response, '<html', status_code=201)
+        self.assertTrue(Comment.objects.filter(
+            post=self.post, text='Быстрый ответ').exists())
+
+    def test_accept_header_selects_fragment(self):
+        """Фрагмент можно попросить и заголовком Accept."""
+        response = self.client.post(self.url, {'text': 'Через Accept'},
+                                    HTTP_ACCEPT='text/html;fragment')
+        self.assertEqual(response.status_code, 201)
+
+    def test_invalid_form_returns_errors(self):
+        """Пустой комментарий — 400 с ошибками формы, без записи."""
+        response = self.post_comment('')
+        self.assertEqual(response.status_code, 400)
+        self.assertContains(response, 'alert-danger', status_code=400)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_plain_form_still_redirects(self):
+        """Обычная отправка формы по-прежнему ведёт на страницу поста."""
+        response = self.client.post(self.url, {'text': 'Без скрипта'})
+        self.assertRedirects(response, reverse(
+            'group_posts:post_detail', kwargs={'post_id': self.post.id}))
+
+    def test_only_post_pages_are_invalidated(self):
+        """Комментарий сдвигает поколение поста, но не автора и главной."""
+        scopes = [f'post:{self.post.id}', f'author:{self.user.id}', 'index']
+        before = generations(scopes)
+        self.post_comment('Точечно')
+        after = generations(scopes)
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1:], before[1:])
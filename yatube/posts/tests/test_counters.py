@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserStats
+
+
+class CountersTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counter(self):
+        """Создание и удаление поста меняют счётчик автора."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        Post.objects.create(author=self.user, text='Пост')
+        self.assertEqual(self.stats(self.user).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+
+    def test_comment_counter(self):
+        """Комментарии считаются в поле поста."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики подписчиков и подписок."""
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(self.stats(self.user).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(self.user).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        """reconcile_counters исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='-')
+        UserStats.objects.filter(user=self.user).update(posts_count=7)
+        UserStats.objects.filter(user=self.reader).delete()
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertTrue(UserStats.objects.filter(user=self.reader).exists())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_profile_uses_counter(self):
+        """Профиль показывает число постов из счётчика."""
+        Post.objects.create(author=self.user, text='Пост')
+        UserStats.objects.filter(user=self.user).update(posts_count=42)
+        response = Client().get(
+            reverse('group_posts:profile',
+                    kwargs={'username': self.user.username}))
+        self.assertEqual(response.context['count_posts'], 42)
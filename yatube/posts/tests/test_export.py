@@ -0,0 +1,117 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+
+class ExportTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='exporter')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='export-slug', description='-')
+        cls.post = Post.objects.create(author=cls.user, text='Мой пост',
+                                       group=cls.group)
+        cls.foreign = Post.objects.create(author=cls.other, text='Чужой',
+                                          group=cls.group)
+        cls.comment = Comment.objects.create(
+            post=cls.foreign, author=cls.user, text='Мой комментарий')
+        cls.url = reverse('group_posts:export')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def download(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_contains_own_data_only(self):
+        """В выгрузке свои посты и комментарии в формате import_jsonl."""
+        response, body = self.download()
+        records = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('yatube-exporter.ndjson',
+                      response['Content-Disposition'])
+        self.assertEqual([record['type'] for record in records],
+                         ['user', 'group', 'post', 'comment'])
+        self.assertEqual(records[0]['username'], 'exporter')
+        self.assertEqual(records[1]['slug'], 'export-slug')
+        self.assertEqual(records[2]['text'], 'Мой пост')
+        self.assertEqual(records[2]['group'], 'export-slug')
+        self.assertEqual(records[3]['post'], self.foreign.id)
+
+    def test_csv_with_gzip(self):
+        """CSV сжимается на лету и читается обратно."""
+        response, body = self.download(format='csv', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = list(csv.reader(io.StringIO(gzip.decompress(body).decode())))
+        self.assertEqual(rows[0][:3], ['type', 'id', 'post'])
+        self.assertEqual(rows[1][5], 'Мой пост')
+        self.assertEqual(len(rows), 3)
+
+    def test_requires_login(self):
+        """Гость отправляется на страницу входа."""
+        response = Client().get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def export(self, *scope):
+        descriptor, path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(descriptor)
+        self.addCleanup(os.remove, path)
+        call_command('export_posts', *scope, '--output', path)
+        return path
+
+    def test_command_exports_group_and_round_trips(self):
+        """Выгрузка группы загружается обратно в пустую базу."""
+        path = self.export('--group', self.group.slug)
+        with open(path, encoding='utf-8') as exported:
+            records = [json.loads(line) for line in exported]
+        self.assertEqual([record['type'] for record in records],
+                         ['user', 'user', 'group', 'post', 'post',
+                          'comment'])
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        call_command('import_jsonl', path, stdout=io.StringIO())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, 'Мой пост')
+        self.assertEqual(post.author.username, 'exporter')
+        self.assertEqual(post.group.slug, 'export-slug')
+        self.assertEqual(Comment.objects.get().text, 'Мой комментарий')
+
+    def test_reimport_into_same_database_skips_existing(self):
+        """Повторная загрузка в ту же базу ничего не дублирует."""
+        path = self.export('--group', self.group.slug)
+        out = io.StringIO()
+        call_command('import_jsonl', path, stdout=out)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertIn('пропущено comment: 1, post: 2', out.getvalue())
+
+    def test_user_export_with_foreign_comments(self):
+        """Комментарии к чужим постам пропускаются по --skip-orphans."""
+        path = self.export('--user', self.user.username)
+        self.foreign.delete()
+        Post.objects.filter(author=self.user).delete()
+        with self.assertRaisesMessage(CommandError, 'нет поста'):
+            call_command('import_jsonl', path, stdout=io.StringIO())
+        Post.objects.filter(author=self.user).delete()
+        call_command('import_jsonl', path, '--skip-orphans',
+                     stdout=io.StringIO())
+        self.assertEqual(Post.objects.get().text, 'Мой пост')
+        self.assertFalse(Comment.objects.exists())
@@ -0,0 +1,312 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import TEN_POST_PAGE
+
+from .. import feed
+from ..feed import hybrid_feed, merged_feed
+from ..models import FeedEntry, Follow, Post
+
+
+class FeedTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.old_post = Post.objects.create(author=cls.author,
+                                           text='Старый пост')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def feed_ids(self):
+        response = self.client.get(reverse('group_posts:follow_index'))
+        return [post.id for post in response.context['page_obj']]
+
+    def test_follow_backfills_feed(self):
+        """Подписка добавляет в ленту уже написанные посты автора."""
+        self.client.get(reverse('group_posts:profile_follow',
+                                kwargs={'username': self.author.username}))
+        self.assertEqual(self.feed_ids(), [self.old_post.id])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает только в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        Post.objects.create(author=self.stranger, text='Чужой пост')
+        self.assertEqual(self.feed_ids(), [post.id, self.old_post.id])
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.stranger).exists())
+
+    def test_unfollow_trims_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.get(reverse('group_posts:profile_unfollow',
+                                kwargs={'username': self.author.username}))
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_feed_cursor_mode(self):
+        """Лента поддерживает курсорную пагинацию."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(
+            reverse('group_posts:follow_index') + '?cursor=')
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.old_post])
+
+    def test_rebuild_feeds_command(self):
+        """Команда rebuild_feeds восстанавливает ленты по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(self.feed_ids(), [self.old_post.id])
+
+
+class TruncatedBackfillTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='prolific')
+        for i in range(TEN_POST_PAGE + 5):
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        patcher = mock.patch('posts.feed.FEED_BACKFILL_POSTS', 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_backfill_is_capped(self):
+        """Подписка кладёт в ленту только последние посты автора."""
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(),
+                         3)
+
+    def test_numbered_pages_reach_old_posts(self):
+        """Страницы с номерами доходят до самых старых постов."""
+        url = reverse('group_posts:follow_index')
+        posts = []
+        for number in (1, 2):
+            response = self.client.get(url, {'page': number})
+            posts += list(response.context['page_obj'])
+        self.assertEqual(posts, self.expected)
+
+    def test_complete_feed_is_not_rescanned(self):
+        """На полной ленте последняя страница не ищет недостающее."""
+        url = reverse('group_posts:follow_index')
+        self.client.get(url, {'page': 2})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'page': 2})
+        self.assertFalse(any('NOT' in query['sql'] for query in queries))
+        newcomer = User.objects.create_user(username='newcomer')
+        old = Post.objects.create(author=newcomer, text='Старый')
+        Post.objects.filter(pk=old.pk).update(
+            pub_date='2000-01-01 00:00:00Z')
+        for i in range(3):
+            Post.objects.create(author=newcomer, text=f'Новый {i}')
+        Follow.objects.create(user=self.reader, author=newcomer)
+        self.assertEqual(feed.extend(self.reader.pk), 1)
+
+    def test_numbered_count_reads_feed_index_only(self):
+        """Число страниц считается по записям ленты, без соединения."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('group_posts:follow_index'))
+        counts = [query['sql'] for query in queries
+                  if 'COUNT(' in query['sql']]
+        self.assertTrue(counts)
+        for count in counts:
+            self.assertIn('"posts_feedentry"', count)
+            self.assertNotIn('"posts_post"', count)
+            self.assertNotIn('GROUP BY', count)
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         FeedEntry.objects.filter(user=self.reader).count())
+
+    def test_cursor_pages_reach_old_posts(self):
+        """Курсорная лента дописывается, когда записи кончаются."""
+        url = reverse('group_posts:follow_index')
+        page = self.client.get(url, {'cursor': ''}).context['page_obj']
+        posts = list(page)
+        while page.has_next():
+            page = self.client.get(
+                url, {'cursor': page.next_cursor}).context['page_obj']
+            posts += list(page)
+        self.assertEqual(posts, self.expected)
+
+    @override_settings(FEED_MODE='hybrid', FEED_PUSH_FOLLOWER_LIMIT=1)
+    def test_hybrid_pushed_stream_is_extended(self):
+        """В hybrid материализованная часть тоже дописывается."""
+        star = User.objects.create_user(username='star')
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=star)
+        Follow.objects.create(user=self.reader, author=star)
+        star_post = Post.objects.create(author=star, text='Звезда')
+        paginator = hybrid_feed(self.reader, TEN_POST_PAGE)
+        page = paginator.page()
+        posts = list(page)
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            posts += list(page)
+        self.assertEqual(posts, [star_post] + self.expected)
+
+
+class MergedFeedTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(4)
+        ]
+        for i in range(TEN_POST_PAGE * 2):
+            Post.objects.create(author=cls.authors[i % 3], text=f'Пост {i}')
+        cls.silent = cls.authors[3]
+        cls.silent_post = Post.objects.create(author=cls.silent,
+                                              text='Давний пост')
+        Post.objects.filter(pk=cls.silent_post.pk).update(
+            pub_date='2000-01-01 00:00:00Z')
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def test_merge_matches_global_order(self):
+        """Слияние потоков совпадает с общей сортировкой по дате."""
+        paginator = merged_feed(self.reader, TEN_POST_PAGE)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        merged = [post for page in pages for post in page]
+        self.assertEqual(merged, self.expected)
+        back = paginator.page(pages[1].previous_cursor)
+        self.assertEqual(list(back), self.expected[:TEN_POST_PAGE])
+
+    def test_merge_skips_authors_below_page(self):
+        """Потоки авторов, не попавших на страницу, не читаются."""
+        paginator = merged_feed(self.reader, TEN_POST_PAGE)
+        with CaptureQueriesContext(connection) as queries:
+            paginator.page()
+        silent = f'"author_id" = {self.silent.id}'
+        self.assertFalse(any(silent in q['sql'] for q in queries))
+
+    def test_heads_seek_each_author_without_group_by(self):
+        """Границы авторов берутся подзапросом по индексу, без GROUP BY."""
+        paginator = merged_feed(self.reader, TEN_POST_PAGE)
+        with CaptureQueriesContext(connection) as queries:
+            heads = dict(paginator._heads(None, False))
+        [query] = queries
+        self.assertNotIn('GROUP BY', query['sql'])
+        silent_date = self.expected[-1].pub_date
+        self.assertEqual(heads[self.silent.id], silent_date)
+        key = (self.expected[-2].pub_date, self.expected[-2].id)
+        self.assertEqual(dict(paginator._heads(key, False)),
+                         {self.silent.id: silent_date})
+
+    def test_author_streams_are_built_lazily(self):
+        """Пагинатор потока строится только для продвинутых авторов."""
+        paginator = merged_feed(self.reader, TEN_POST_PAGE)
+        with mock.patch('posts.feed.CursorPaginator',
+                        wraps=feed.CursorPaginator) as built:
+            paginator.page()
+        self.assertEqual(built.call_count, 3)
+
+    @override_settings(FEED_MODE='pull')
+    def test_follow_index_pull_mode(self):
+        """В режиме pull лента подписок строится слиянием."""
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('group_posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         self.expected[:TEN_POST_PAGE])
+
+
+@override_settings(FEED_MODE='hybrid', FEED_PUSH_FOLLOWER_LIMIT=1)
+class HybridFeedTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='writer')
+        for user in (cls.reader, cls.fan):
+            Follow.objects.create(user=user, author=cls.star)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_star_posts_are_pulled(self):
+        """Посты автора сверх порога не рассылаются, но видны в ленте."""
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate([self.star, self.author] * 3)
+        ]
+        self.assertFalse(
+            FeedEntry.objects.filter(post__author=self.star).exists())
+        self.assertEqual(
+            FeedEntry.objects.filter(post__author=self.author).count(), 3)
+        response = self.client.get(reverse('group_posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         posts[::-1])
+
+    def test_star_below_limit_keeps_posts(self):
+        """Вернувшись под порог, автор не теряет постов в лентах."""
+        post = Post.objects.create(author=self.star, text='Сверх порога')
+        newcomer = User.objects.create_user(username='newcomer')
+        Follow.objects.create(user=newcomer, author=self.star)
+        Follow.objects.filter(user=self.fan, author=self.star).delete()
+        Follow.objects.filter(user=newcomer, author=self.star).delete()
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=self.reader, post=post)
+                 .values_list('post', flat=True)), [post.id])
+        response = self.client.get(reverse('group_posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        fresh = Post.objects.create(author=self.star, text='Под порогом')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=fresh).exists())
+
+    def test_newcomers_get_backfill_after_drop(self):
+        """Подписчик, пришедший сверх порога, получает backfill."""
+        post = Post.objects.create(author=self.star, text='Старый')
+        newcomer = User.objects.create_user(username='newcomer')
+        Follow.objects.create(user=newcomer, author=self.star)
+        self.assertFalse(FeedEntry.objects.filter(user=newcomer).exists())
+        Follow.objects.filter(user__in=[self.fan, self.reader],
+                              author=self.star).delete()
+        self.assertTrue(
+            FeedEntry.objects.filter(user=newcomer, post=post).exists())
+
+    def test_crossing_limit_resets_celebrities(self):
+        """Автор, перешедший порог, сразу перестаёт рассылаться."""
+        self.assertTrue(feed.is_pushed(self.author.id))
+        Follow.objects.create(user=self.fan, author=self.author)
+        self.assertFalse(feed.is_pushed(self.author.id))
+        post = Post.objects.create(author=self.author, text='Уже звезда')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+    def test_feed_celebrities_command(self):
+        """Команда feed_celebrities сообщает авторов сверх порога."""
+        out = StringIO()
+        call_command('feed_celebrities', stdout=out)
+        self.assertIn('star\t2', out.getvalue())
+        self.assertNotIn('writer', out.getvalue())
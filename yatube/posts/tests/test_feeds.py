@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+
+
+class FeedTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='writer', first_name='Анна', last_name='Каренина')
+        cls.group = Group.objects.create(
+            title='Романы', slug='novels', description='Длинные тексты')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Все счастливые семьи похожи')
+        cls.urls = {
+            'index_rss': {},
+            'index_atom': {},
+            'group_rss': {'slug': cls.group.slug},
+            'group_atom': {'slug': cls.group.slug},
+            'profile_rss': {'username': cls.user.username},
+            'profile_atom': {'username': cls.user.username},
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def url(self, name):
+        return reverse(f'group_posts:{name}', kwargs=self.urls[name])
+
+    def test_feeds_list_posts(self):
+        """Ленты всех трёх областей в обоих форматах содержат пост."""
+        for name in self.urls:
+            with self.subTest(name=name):
+                response = self.client.get(self.url(name))
+                self.assertEqual(response.status_code, 200)
+                kind = 'atom' if name.endswith('atom') else 'rss'
+                self.assertIn(kind, response['Content-Type'])
+                self.assertContains(response, self.post.text)
+                self.assertContains(response, 'Анна Каренина')
+                self.assertContains(response, reverse(
+                    'group_posts:post_detail', args=[self.post.id]))
+
+    def test_polling_gets_not_modified(self):
+        """Повторный опрос с ETag — 304 за один запрос к БД."""
+        url = self.url('group_rss')
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+    def test_new_post_invalidates_feeds(self):
+        """Новый пост сразу попадает во все свои ленты."""
+        etags = {name: self.client.get(self.url(name))['ETag']
+                 for name in self.urls}
+        Post.objects.create(author=self.user, group=self.group,
+                            text='Каждая несчастливая семья')
+        for name, etag in etags.items():
+            with self.subTest(name=name):
+                response = self.client.get(self.url(name),
+                                           HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'Каждая несчастливая семья')
+
+    def test_one_cached_copy_for_all_readers(self):
+        """Лента общая: вошедший читатель получает ту же копию из кэша."""
+        url = self.url('index_rss')
+        etag = self.client.get(url)['ETag']
+        reader = Client()
+        reader.force_login(User.objects.create_user(username='reader'))
+        response = reader.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_unknown_group_not_found(self):
+        """Лента несуществующей группы — 404."""
+        response = self.client.get(reverse(
+            'group_posts:group_atom', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
@@ -1,4 +1,4 @@
-
+import hashlib
 import shutil
 import tempfile
 
@@ -75,10 +75,11 @@ class PostFormTest(TestCase):
             follow=True
         )
         self.assertEqual(Post.objects.count(), posts_count + COUNT_ONE)
+        digest = hashlib.sha256(self.small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text='Текст поста',
-                image='posts/small.gif'
+                image=f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
             ).exists()
         )
 
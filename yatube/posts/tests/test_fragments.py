@@ -0,0 +1,55 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..caching import bump
+from ..fragments import render_cards
+from ..models import Group, Post
+
+
+class PostCardCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='card',
+                                            first_name='Карточка')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='card-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(author=cls.user, text='Текст карточки',
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def posts(self):
+        return Post.objects.select_related('author', 'group')
+
+    def test_cards_are_cached(self):
+        """Повторный рендер карточек берёт разметку из кэша."""
+        [(post, html)] = render_cards(self.posts())
+        self.assertIn('Текст карточки', html)
+        with self.assertTemplateNotUsed('posts/includes/post_list.html'):
+            [(_, cached)] = render_cards(self.posts())
+        self.assertEqual(html, cached)
+
+    def test_edit_changes_card_version(self):
+        """Правка поста сразу меняет карточку."""
+        render_cards(self.posts())
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        [(_, html)] = render_cards(self.posts())
+        self.assertIn('Новый текст', html)
+
+    def test_list_pages_use_cards(self):
+        """Страница списка собирается из закэшированных карточек."""
+        url = reverse('group_posts:group_list',
+                      kwargs={'slug': self.group.slug})
+        self.assertContains(Client().get(url), 'Текст карточки')
+        bump(f'group:{self.group.pk}')
+        response = Client().get(url)
+        self.assertContains(response, 'Текст карточки')
+        self.assertTemplateNotUsed(response, 'posts/includes/post_list.html')
@@ -0,0 +1,105 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..models import Comment, FeedEntry, Follow, Group, Post
+from ..search import engine
+
+RECORDS = [
+    {'type': 'user', 'username': 'leo', 'first_name': 'Лев'},
+    {'type': 'group', 'slug': 'cats', 'title': 'Коты', 'description': '-'},
+    {'type': 'post', 'id': 500, 'author': 'leo', 'group': 'cats',
+     'text': 'Импортированный мурлыкающий пост',
+     'pub_date': '2021-05-01T12:00:00Z'},
+    {'type': 'post', 'author': 'reader', 'text': 'Пост без группы'},
+    {'type': 'comment', 'post': 500, 'author': 'reader', 'text': 'Мяу',
+     'created': '2021-05-02T08:30:00'},
+    {'type': 'follow', 'user': 'reader', 'author': 'leo'},
+    {'type': 'follow', 'user': 'reader', 'author': 'leo'},
+]
+
+
+class ImportJsonlTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        descriptor, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(descriptor)
+        self.addCleanup(os.remove, self.path)
+
+    def write(self, records, path=None, opener=open):
+        with opener(path or self.path, 'wt', encoding='utf-8') as output:
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command('import_jsonl', self.path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_imports_in_batches(self):
+        """Записи импортируются с ссылками, датами и id из файла."""
+        self.write(RECORDS)
+        output = self.run_import('--batch-size=2')
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.author.username, 'leo')
+        self.assertEqual(post.group, Group.objects.get(slug='cats'))
+        self.assertEqual(post.pub_date,
+                         datetime(2021, 5, 1, 12, tzinfo=timezone.utc))
+        comment = Comment.objects.get(post=post)
+        self.assertEqual(comment.created,
+                         datetime(2021, 5, 2, 8, 30, tzinfo=timezone.utc))
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 1)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertIn('Импортировано 6 записей', output)
+        self.assertIn('в секунду', output)
+
+    def test_rebuilds_derived_data_once(self):
+        """Счётчики, поисковый индекс и ленты пересобраны после импорта."""
+        self.write(RECORDS)
+        self.run_import()
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.author.stats.posts_count, 1)
+        self.assertEqual(post.author.stats.followers_count, 1)
+        self.assertIn(post, engine().filter(Post.objects.all(), 'мурлыкающий'))
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=post).exists())
+
+    def test_existing_users_and_groups_are_reused(self):
+        """Повторные пользователи и группы не создаются заново."""
+        self.write(RECORDS[:2])
+        self.run_import()
+        self.run_import()
+        self.assertEqual(User.objects.filter(username='leo').count(), 1)
+        self.assertEqual(Group.objects.filter(slug='cats').count(), 1)
+
+    def test_gzip_input(self):
+        """Сжатый gzip файл читается потоком."""
+        path = self.path + '.gz'
+        self.addCleanup(os.remove, path)
+        self.write(RECORDS[:3], path, gzip.open)
+        call_command('import_jsonl', path, stdout=StringIO())
+        self.assertTrue(Post.objects.filter(pk=500).exists())
+
+    def test_bad_record_reports_line(self):
+        """Ошибка называет строку, а уже сброшенные пачки сохраняются."""
+        self.write(RECORDS[:3] + [
+            {'type': 'comment', 'post': 404, 'author': 'leo', 'text': '-'}])
+        with self.assertRaisesMessage(CommandError, 'Строка 4'):
+            self.run_import('--batch-size=3')
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.author.stats.posts_count, 1)
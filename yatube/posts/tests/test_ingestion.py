@@ -0,0 +1,238 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, features
+
+from ..imaging import available_formats, process, variant_path
+from ..ingestion import process_post, schedule
+from ..thumbnails import generate_for_post
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION = 0x0112
+MAKE = 0x010f
+
+
+def photo(size, orientation=None):
+    image = Image.new('RGB', size, 'red')
+    exif = image.getexif()
+    exif[MAKE] = 'Телефон'
+    if orientation:
+        exif[ORIENTATION] = orientation
+    output = BytesIO()
+    image.save(output, 'JPEG', exif=exif.tobytes())
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class IngestionTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, content):
+        return Post.objects.create(
+            author=self.user, text='Фото',
+            image=SimpleUploadedFile('photo.jpg', content, 'image/jpeg'))
+
+    def test_process_normalizes_original(self):
+        """Оригинал повёрнут по EXIF, уменьшен и лишён метаданных."""
+        path = os.path.join(TEMP_MEDIA_ROOT, 'rotated.jpg')
+        content = photo((3000, 1000), orientation=6)
+        with open(path, 'wb') as output:
+            output.write(content)
+        staging = os.path.join(TEMP_MEDIA_ROOT, 'staging')
+        staged, extensions, widths, metadata = process(
+            path, staging, 2048, (480, 960, 1440), ('webp', 'jpg'), 85)
+        self.assertEqual(extensions, available_formats(('webp', 'jpg')))
+        self.assertEqual(widths, [480, 683])
+        self.assertEqual((metadata['width'], metadata['height']),
+                         (683, 2048))
+        with open(path, 'rb') as original:
+            self.assertEqual(original.read(), content)
+        with open(staged, 'rb') as normalized:
+            digest = hashlib.sha256(normalized.read()).hexdigest()
+        self.assertEqual(os.path.basename(staged), digest + '.jpg')
+        with Image.open(staged) as image:
+            self.assertEqual(image.size, (683, 2048))
+            self.assertEqual(dict(image.getexif()), {})
+        for width in widths:
+            for extension in extensions:
+                with Image.open(variant_path(staged, width, extension)) as im:
+                    self.assertEqual(im.width, width)
+
+    def test_process_post_stores_variants(self):
+        """Варианты записываются в пост и выводятся в srcset."""
+        post = self.create_post(photo((1200, 800)))
+        uploaded = post.image.name
+        process_post(post)
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, uploaded)
+        self.assertTrue(post.image.storage.exists(uploaded))
+        with post.image.open('rb') as normalized:
+            digest = hashlib.sha256(normalized.read()).hexdigest()
+        self.assertEqual(os.path.basename(post.image.name), digest + '.jpg')
+        extensions = available_formats(settings.IMAGE_VARIANT_FORMATS)
+        self.assertEqual(post.image_variants,
+                         ','.join(extensions) + ':480,960,1200')
+        response = self.client.get(
+            reverse('group_posts:post_detail', args=[post.id]))
+        self.assertContains(response, '-960.jpg 960w')
+
+    def test_reupload_of_processed_file_is_not_reprocessed(self):
+        """Повторно загруженный обработанный файл берёт готовый результат."""
+        post = self.create_post(photo((1200, 800)))
+        process_post(post)
+        post.refresh_from_db()
+        with post.image.open('rb') as served:
+            copy = self.create_post(served.read())
+        self.assertEqual(copy.image.name, post.image.name)
+        with mock.patch('posts.ingestion.transaction.on_commit',
+                        side_effect=lambda submit: submit()), \
+                mock.patch('posts.ingestion.executor') as executor, \
+                mock.patch('posts.ingestion.thumbnails.schedule'):
+            schedule(copy)
+        executor().submit.assert_not_called()
+        copy.refresh_from_db()
+        self.assertEqual(copy.image_variants, post.image_variants)
+
+    def test_views_schedule_ingestion(self):
+        """post_create отправляет картинку в пул обработки."""
+        with mock.patch('posts.views.ingestion.schedule') as schedule:
+            self.client.post(reverse('group_posts:post_create'), {
+                'text': 'Новое фото',
+                'image': SimpleUploadedFile('new.jpg', photo((10, 10)),
+                                            'image/jpeg'),
+            })
+        [(post,), _] = schedule.call_args
+        self.assertEqual(post.text, 'Новое фото')
+
+    def test_schedule_skips_pending_file(self):
+        """Файл в обработке не ставится повторно при каждом показе."""
+        post = self.create_post(photo((40, 40)))
+        with mock.patch('posts.ingestion.transaction.on_commit',
+                        side_effect=lambda submit: submit()), \
+                mock.patch('posts.ingestion.executor') as executor, \
+                mock.patch('posts.ingestion.thumbnails.schedule'):
+            for _ in range(3):
+                schedule(post)
+            self.assertEqual(executor().submit.call_count, 1)
+            future = executor().submit.return_value
+            [(done,), _] = future.add_done_callback.call_args
+            future.result.side_effect = RuntimeError('сбой')
+            with self.assertLogs('posts.ingestion', 'ERROR'):
+                done(future)
+            schedule(post)
+            self.assertEqual(executor().submit.call_count, 2)
+
+    def test_new_image_resets_variants(self):
+        """Смена картинки сбрасывает варианты прежней."""
+        post = self.create_post(photo((600, 400)))
+        process_post(post)
+        with mock.patch('posts.views.ingestion.schedule'):
+            self.client.post(
+                reverse('group_posts:post_edit', args=[post.id]), {
+                    'text': 'Другое фото',
+                    'image': SimpleUploadedFile('other.jpg',
+                                                photo((20, 20)),
+                                                'image/jpeg'),
+                })
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, '')
+
+    def test_process_images_command(self):
+        """process_images обрабатывает картинки без вариантов."""
+        post = self.create_post(photo((500, 500)))
+        out = StringIO()
+        call_command('process_images', stdout=out)
+        self.assertIn('1', out.getvalue())
+        post.refresh_from_db()
+        self.assertTrue(post.image_variants.endswith(':480,500'))
+
+    def test_upload_stores_image_metadata(self):
+        """При загрузке читаются только размеры, цвет считает воркер."""
+        with mock.patch('posts.views.ingestion.schedule'):
+            self.client.post(reverse('group_posts:post_create'), {
+                'text': 'С размерами',
+                'image': SimpleUploadedFile(
+                    'sized.jpg', photo((4000, 1000), orientation=8),
+                    'image/jpeg'),
+            })
+        post = Post.objects.get(text='С размерами')
+        self.assertEqual((post.image_width, post.image_height), (512, 2048))
+        self.assertEqual((post.image_color, post.image_lqip), ('', ''))
+        process_post(post)
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (512, 2048))
+        self.assertEqual(post.image_color, '#fe0000')
+        self.assertTrue(post.image_lqip.startswith('data:image/png;base64,'))
+
+    def test_upload_does_not_decode_pixels(self):
+        """Загрузка PNG, WebP и GIF не декодирует картинку в запросе."""
+        formats = ['PNG', 'GIF'] + ['WEBP'] * features.check('webp')
+        for save_format in formats:
+            with self.subTest(save_format=save_format):
+                output = BytesIO()
+                Image.new('RGB', (300, 200), 'blue').save(output, save_format)
+                name = 'flat.' + save_format.lower()
+                with mock.patch('posts.views.ingestion.schedule'), \
+                        mock.patch('PIL.ImageFile.ImageFile.load',
+                                   side_effect=AssertionError) as load:
+                    self.client.post(reverse('group_posts:post_create'), {
+                        'text': name,
+                        'image': SimpleUploadedFile(
+                            name, output.getvalue(),
+                            'image/' + save_format.lower()),
+                    })
+                load.assert_not_called()
+                post = Post.objects.get(text=name)
+                self.assertEqual((post.image_width, post.image_height),
+                                 (300, 200))
+
+    def test_card_is_sized_without_opening_file(self):
+        """Карточка выводит размеры и lazy-загрузку, не открывая файл."""
+        post = self.create_post(photo((1200, 800)))
+        process_post(post)
+        post.refresh_from_db()
+        generate_for_post(post)
+        cache.clear()
+        with mock.patch('django.core.files.storage.FileSystemStorage.open',
+                        side_effect=AssertionError) as opened:
+            response = self.client.get(reverse('group_posts:index'))
+        opened.assert_not_called()
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, post.image_color)
+
+    def test_backfill_image_metadata(self):
+        """backfill_image_metadata заполняет поля старых постов."""
+        post = self.create_post(photo((300, 200)))
+        out = StringIO()
+        call_command('backfill_image_metadata', stdout=out)
+        self.assertIn('1', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (300, 200))
+        self.assertTrue(post.image_color.startswith('#'))
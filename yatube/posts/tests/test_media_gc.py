@@ -0,0 +1,154 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default
+
+from ..media_gc import RateLimiter, walk
+from ..models import Post
+from ..thumbnails import generate, ready
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+OLD = time.time() - 2 * 24 * 60 * 60
+
+
+def jpeg(color):
+    output = BytesIO()
+    Image.new('RGB', (20, 20), color).save(output, 'JPEG')
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaGCTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='collector')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'gc.checkpoint')
+        patcher = mock.patch(
+            'posts.management.commands.gc_media.GC_MEDIA_CHECKPOINT',
+            self.checkpoint)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.post = Post.objects.create(
+            author=self.user, text='Живой',
+            image=SimpleUploadedFile('kept.jpg', jpeg('red'), 'image/jpeg'))
+
+    def media_file(self, name, content=b'x', mtime=OLD):
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as output:
+            output.write(content)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command('gc_media', '--rate=0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_deletes_orphans_and_keeps_referenced(self):
+        """Удаляются только файлы, на которые не ссылается ни один пост."""
+        os.utime(self.post.image.path, (OLD, OLD))
+        self.media_file('posts/ab/cd/orphan.jpg', b'12345')
+        output = self.gc()
+        self.assertFalse(self.exists('posts/ab/cd/orphan.jpg'))
+        self.assertTrue(self.exists(self.post.image.name))
+        self.assertIn('Удалено: 1 (5 байт)', output)
+
+    def test_variants_follow_their_original(self):
+        """Варианты srcset живут, пока жив их оригинал."""
+        directory, filename = os.path.split(self.post.image.name)
+        stem = os.path.splitext(filename)[0]
+        kept = f'{directory}/variants/{stem}-480.jpg'
+        self.media_file(kept)
+        self.media_file('posts/old/variants/gone-480.jpg')
+        self.gc()
+        self.assertTrue(self.exists(kept))
+        self.assertFalse(self.exists('posts/old/variants/gone-480.jpg'))
+
+    def test_dry_run_deletes_nothing(self):
+        """Пробный прогон только перечисляет сирот."""
+        self.media_file('posts/orphan.jpg', b'123')
+        output = self.gc('--dry-run')
+        self.assertTrue(self.exists('posts/orphan.jpg'))
+        self.assertIn('posts/orphan.jpg\t3', output)
+        self.assertIn('Можно удалить: 1', output)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_grace_period_protects_fresh_files(self):
+        """Свежий файл может быть загрузкой, пост для которой ещё пишется."""
+        self.media_file('posts/fresh.jpg', mtime=time.time())
+        self.gc()
+        self.assertTrue(self.exists('posts/fresh.jpg'))
+        self.gc('--grace=0')
+        self.assertFalse(self.exists('posts/fresh.jpg'))
+
+    def test_resumes_after_checkpoint(self):
+        """Обход продолжается с сохранённой точки, а в конце её забывает."""
+        self.media_file('posts/a/first.jpg')
+        self.media_file('posts/b/second.jpg')
+        with open(self.checkpoint, 'w') as checkpoint:
+            checkpoint.write('posts/a/first.jpg')
+        self.gc()
+        self.assertTrue(self.exists('posts/a/first.jpg'))
+        self.assertFalse(self.exists('posts/b/second.jpg'))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_walk_skips_directories_before_checkpoint(self):
+        """Каталоги до точки продолжения не обходятся вовсе."""
+        for name in ('posts/a/1.jpg', 'posts/b/2.jpg', 'posts/b/3.jpg',
+                     'posts/c/4.jpg'):
+            self.media_file(name)
+        names = [media_file.name for media_file in walk(
+            TEMP_MEDIA_ROOT, ('posts', 'b', '2.jpg'), ('posts',))]
+        self.assertEqual(names, ['posts/b/3.jpg', 'posts/c/4.jpg'])
+
+    def test_deletes_thumbnails_of_orphan(self):
+        """С осиротевшим оригиналом уходят его миниатюры и записи sorl."""
+        image = self.post.image
+        generate(image)
+        thumbnail = ready(image, 'card')
+        self.assertIsNotNone(thumbnail)
+        os.utime(image.path, (OLD, OLD))
+        Post.objects.filter(pk=self.post.pk).update(image='')
+        default.kvstore.clear_lru()
+        self.gc()
+        self.assertFalse(self.exists(image.name))
+        self.assertIsNone(ready(image, 'card'))
+        self.assertFalse(thumbnail.exists())
+
+    def test_rate_limiter_spaces_calls(self):
+        """Ограничитель выдерживает интервал 1 / rate между вызовами."""
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        limiter = RateLimiter(4, clock=lambda: now[0], sleep=sleep)
+        for _ in range(3):
+            limiter.wait()
+        self.assertEqual(sleeps, [0.25, 0.25])
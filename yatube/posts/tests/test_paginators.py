@@ -0,0 +1,93 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import TEN_POST_PAGE, THIRTEEN_POSTS, THREE_POST_PAGE
+
+from ..models import Group, Post
+from ..paginators import (CursorPaginator, InvalidCursor, decode_cursor,
+                          encode_cursor)
+
+
+class CursorPaginatorTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cursor-slug',
+            description='Тестовое описание',
+        )
+        for i in range(THIRTEEN_POSTS):
+            Post.objects.create(author=cls.user, text=f'Текст {i}',
+                                group=cls.group)
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_cursor_roundtrip(self):
+        """Токен курсора однозначно распаковывается."""
+        token = encode_cursor('n', ['2022-01-01 00:00:00+00:00', 5])
+        self.assertEqual(decode_cursor(token),
+                         ('n', ['2022-01-01 00:00:00+00:00', 5]))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('мусор')
+
+    def test_pages_follow_each_other(self):
+        """Следующая и предыдущая страницы стыкуются без пропусков."""
+        paginator = CursorPaginator(Post.objects.all(), TEN_POST_PAGE)
+        first = paginator.page()
+        self.assertEqual(list(first), self.ordered[:TEN_POST_PAGE])
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(list(second), self.ordered[TEN_POST_PAGE:])
+        self.assertEqual(len(second), THREE_POST_PAGE)
+        self.assertFalse(second.has_next())
+        back = paginator.page(second.previous_cursor)
+        self.assertEqual(list(back), self.ordered[:TEN_POST_PAGE])
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), TEN_POST_PAGE)
+        page = paginator.get_page('bm90LWpzb24')
+        self.assertEqual(list(page), self.ordered[:TEN_POST_PAGE])
+
+    def test_cursor_page_without_count(self):
+        """Курсорная страница не делает COUNT и OFFSET."""
+        paginator = CursorPaginator(Post.objects.all(), TEN_POST_PAGE)
+        cursor = paginator.page().next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            list(paginator.page(cursor))
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_views_use_cursor_mode(self):
+        """Списки постов переключаются в курсорный режим по ?cursor=."""
+        urls = [
+            reverse('group_posts:index'),
+            reverse('group_posts:group_list',
+                    kwargs={'slug': self.group.slug}),
+            reverse('group_posts:profile',
+                    kwargs={'username': self.user.username}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url + '?cursor=')
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), TEN_POST_PAGE)
+                self.assertContains(response, page_obj.next_cursor)
+                response = self.client.get(
+                    url + '?cursor=' + page_obj.next_cursor)
+                self.assertEqual(len(response.context['page_obj']),
+                                 THREE_POST_PAGE)
@@ -0,0 +1,106 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import THIRTEEN_POSTS
+
+from ..models import Comment, Follow, Group, Post
+from ..urls import app_name, urlpatterns
+
+# Максимум SQL-запросов на один GET авторизованного пользователя
+# при пустом кэше.
+# Каждый маршрут posts/urls.py обязан иметь здесь бюджет.
+QUERY_BUDGETS = {
+    'index': 4,
+    'index_rss': 3,
+    'index_atom': 3,
+    'group_list': 6,
+    'group_rss': 4,
+    'group_atom': 4,
+    'profile': 7,
+    'profile_rss': 4,
+    'profile_atom': 4,
+    'post_detail': 5,
+    'post_comments': 4,
+    'search': 2,
+    'post_create': 3,
+    'post_edit': 4,
+    'add_comment': 3,
+    'follow_index': 5,
+    'export': 5,
+    'profile_follow': 9,
+    'profile_unfollow': 9,
+}
+
+
+class QueryBudgetTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='budget-slug',
+            description='Тестовое описание',
+        )
+        for i in range(THIRTEEN_POSTS):
+            author = User.objects.create_user(
+                username=f'author{i}', first_name='Имя', last_name=str(i))
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'budget-{i}', description='-')
+            post = Post.objects.create(author=author, text=f'Пост {i}',
+                                       group=group if i % 2 else cls.group)
+            Comment.objects.create(post=post, author=author, text='-')
+            Comment.objects.create(post=post, author=cls.reader, text='-')
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.newcomer = User.objects.create_user(username='newcomer')
+        cls.post = Post.objects.create(author=cls.reader, text='Свой пост',
+                                       group=cls.group)
+        cls.kwargs = {
+            'group_list': {'slug': cls.group.slug},
+            'group_rss': {'slug': cls.group.slug},
+            'group_atom': {'slug': cls.group.slug},
+            'profile': {'username': author.username},
+            'profile_rss': {'username': author.username},
+            'profile_atom': {'username': author.username},
+            'post_detail': {'post_id': post.id},
+            'post_comments': {'post_id': post.id},
+            'post_edit': {'post_id': cls.post.id},
+            'add_comment': {'post_id': post.id},
+            'profile_follow': {'username': cls.newcomer.username},
+            'profile_unfollow': {'username': author.username},
+        }
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def assertQueryBudget(self, url, budget):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                # Потоковый ответ читает базу, пока отдаётся тело.
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{url}: {len(queries)} запросов при бюджете {budget}:\n'
+            + '\n'.join(query['sql'] for query in queries))
+
+    def test_every_url_has_budget(self):
+        """Для каждого маршрута posts/urls.py объявлен бюджет запросов."""
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(names - set(QUERY_BUDGETS), set())
+
+    def test_pages_within_query_budget(self):
+        """Страницы укладываются в бюджет запросов независимо от N постов."""
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                url = reverse(f'{app_name}:{name}',
+                              kwargs=self.kwargs.get(name))
+                self.assertQueryBudget(url, budget)
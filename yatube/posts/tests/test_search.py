@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from yatube.settings import TEN_POST_PAGE, THIRTEEN_POSTS
+
+from ..models import Post
+from ..search import (FTS_TABLE, FTS5SearchEngine, LikeSearchEngine,
+                      engine)
+
+
+class SearchTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.once = Post.objects.create(
+            author=cls.user, text='Кот спит на диване')
+        cls.twice = Post.objects.create(
+            author=cls.user, text='Кот и ещё раз кот')
+        cls.other = Post.objects.create(
+            author=cls.user, text='Собака <b>лает</b>')
+
+    def setUp(self):
+        self.client = Client()
+
+    def results(self, query, engine=None):
+        paginator = (engine or FTS5SearchEngine()).paginator(
+            query, TEN_POST_PAGE)
+        return list(paginator.get_page(None))
+
+    def test_fts_is_used_on_sqlite(self):
+        """На SQLite с FTS5 выбирается индексный движок."""
+        self.assertIsInstance(engine(), FTS5SearchEngine)
+
+    def test_results_are_ranked(self):
+        """Пост с большим числом совпадений выше в выдаче."""
+        self.assertEqual(self.results('кот'), [self.twice, self.once])
+
+    def test_prefix_and_case(self):
+        """Последнее слово ищется как префикс, регистр не важен."""
+        self.assertEqual(self.results('ДИВ'), [self.once])
+        self.assertEqual(self.results('кот див'), [self.once])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Совпадения подсвечены, HTML из текста экранирован."""
+        [post] = self.results('лает')
+        self.assertEqual(post.snippet,
+                         'Собака &lt;b&gt;<mark>лает</mark>&lt;/b&gt;')
+
+    def test_fts_syntax_is_not_interpreted(self):
+        """Операторы FTS в запросе считаются обычным текстом."""
+        self.assertEqual(self.results('кот OR NEAR("'), [])
+        self.assertIsNone(FTS5SearchEngine().paginator('"*()', 10))
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.create(author=self.user, text='Старый текст')
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.results('старый'), [])
+        self.assertEqual(self.results('новый'), [post])
+        post.delete()
+        self.assertEqual(self.results('новый'), [])
+
+    def test_cursor_pagination(self):
+        """Курсор по (rank, id) проходит выдачу без повторов."""
+        posts = [Post.objects.create(author=self.user, text='Пагинация')
+                 for _ in range(THIRTEEN_POSTS)]
+        paginator = FTS5SearchEngine().paginator('пагинация', TEN_POST_PAGE)
+        first = paginator.get_page(None)
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(len(first), TEN_POST_PAGE)
+        self.assertFalse(second.has_next())
+        self.assertEqual(list(first) + list(second), posts[::-1])
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+
+    def test_rebuild_command(self):
+        """rebuild_search_index восстанавливает индекс с нуля."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        self.assertEqual(self.results('кот'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn(str(Post.objects.count()), out.getvalue())
+        self.assertEqual(self.results('кот'), [self.twice, self.once])
+
+    def test_like_engine_has_same_interface(self):
+        """Запасной движок находит те же посты и так же подсвечивает."""
+        like = LikeSearchEngine()
+        self.assertEqual(self.results('спит', like), [self.once])
+        [post] = self.results('лает', like)
+        self.assertIn('<mark>лает</mark>', post.snippet)
+        self.assertEqual(
+            set(like.filter(Post.objects.all(), 'раз кот')),
+            set(FTS5SearchEngine().filter(Post.objects.all(), 'раз кот')))
+
+    def test_search_page(self):
+        """Страница поиска выводит выдачу по параметру q."""
+        url = reverse('group_posts:search')
+        response = self.client.get(url)
+        self.assertIsNone(response.context['page_obj'])
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'q': 'кот'})
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.twice, self.once])
+        self.assertContains(response, '<mark>')
@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from ..fragments import render_cards
+from ..ingestion import process_post
+from ..models import Post
+from ..thumbnails import generate_for_post, ready, thumbnail_file
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='thumbs')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear_lru()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(
+            author=self.user, text='С картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'))
+
+    def test_page_shows_placeholder_until_ready(self):
+        """Пока миниатюры нет, страница показывает заглушку и не ждёт её."""
+        with mock.patch('posts.thumbnails.default.engine.get_image') as get:
+            response = self.client.get(reverse('group_posts:index'))
+        get.assert_not_called()
+        self.assertContains(response, settings.THUMBNAIL_PLACEHOLDER)
+        self.assertIsNone(ready(self.post.image, 'card'))
+
+    def test_generated_thumbnail_replaces_placeholder(self):
+        """После генерации страницы перестраиваются с миниатюрой."""
+        self.client.get(reverse('group_posts:index'))
+        self.assertEqual(generate_for_post(self.post), 1)
+        self.assertIsNotNone(ready(self.post.image, 'card'))
+        response = self.client.get(reverse('group_posts:index'))
+        self.assertNotContains(response, settings.THUMBNAIL_PLACEHOLDER)
+        self.assertContains(response,
+                            thumbnail_file(self.post.image, 'card').url)
+        self.assertEqual(generate_for_post(self.post), 0)
+
+    def test_ingestion_schedules_thumbnails(self):
+        """Миниатюры ставятся в очередь после обработки картинки."""
+        with mock.patch('posts.ingestion.thumbnails.schedule') as schedule:
+            process_post(self.post)
+        schedule.assert_called_once_with(self.post)
+
+    def test_pregenerate_command(self):
+        """pregenerate_thumbnails создаёт недостающие миниатюры."""
+        out = StringIO()
+        call_command('pregenerate_thumbnails', workers=0, stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertIsNotNone(ready(self.post.image, 'card'))
+
+    def kvstore_queries(self, posts):
+        with CaptureQueriesContext(connection) as queries:
+            render_cards(posts)
+        return [query for query in queries
+                if 'thumbnail_kvstore' in query['sql']]
+
+    def test_page_thumbnails_in_one_lookup(self):
+        """Миниатюры всех карточек страницы ищутся одним запросом."""
+        posts = [self.post] + [
+            Post.objects.create(
+                author=self.user, text=f'Пост {i}',
+                image=SimpleUploadedFile(f'{i}.gif', SMALL_GIF, 'image/gif'))
+            for i in range(3)
+        ]
+        for post in posts:
+            generate_for_post(post)
+        cache.clear()
+        default.kvstore.clear_lru()
+        posts = list(Post.objects.select_related('author', 'group'))
+        self.assertEqual(len(self.kvstore_queries(posts)), 1)
+        cache.clear()
+        posts = list(Post.objects.select_related('author', 'group'))
+        self.assertEqual(self.kvstore_queries(posts), [])
+        html = ''.join(card for _, card in render_cards(posts))
+        self.assertNotIn(settings.THUMBNAIL_PLACEHOLDER, html)
@@ -93,17 +93,16 @@ class TaskPagesTests(TestCase):
                 self.assertTemplateUsed(response, template)
 
     def test_cache_index_page_correct_context(self):
-        """Кэш index сформирован с правильным контекстом."""
+        """Кэш index держится до записи и сбрасывается удалением поста."""
         response = self.authorized_client.get(reverse('group_posts:index'))
         content = response.content
+        cached_response = self.authorized_client.get(
+            reverse('group_posts:index'))
+        self.assertIsNone(cached_response.context)
+        self.assertEqual(content, cached_response.content)
         post_id = TaskPagesTests.post.id
         instance = Post.objects.get(pk=post_id)
         instance.delete()
-        new_response = self.authorized_client.get(
-            reverse('group_posts:index'))
-        new_content = new_response.content
-        self.assertEqual(content, new_content)
-        cache.clear()
         response_new = self.authorized_client.get(
             reverse('group_posts:index'))
         content_new = response_new.content
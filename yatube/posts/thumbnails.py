@@ -0,0 +1,178 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+from . import caching
+from yatube.settings import (POST_THUMBNAILS, THUMBNAIL_PLACEHOLDER,
+                             THUMBNAIL_WORKERS)
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_pending = set()
+_lock = threading.Lock()
+
+
+class Placeholder:
+    '''Заглушка вместо ещё не готовой миниатюры, с теми же url и размерами.'''
+    is_placeholder = True
+
+    def __init__(self, geometry):
+        self.width, self.height = parse_geometry(geometry)
+        self.url = staticfiles_storage.url(THUMBNAIL_PLACEHOLDER)
+
+
+def _options(source, options):
+    '''Опции sorl так же, как их дополняет ThumbnailBackend.get_thumbnail.'''
+    options = dict(options)
+    backend = default.backend
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, alias):
+    '''ImageFile миниатюры alias; ни файла, ни записи может ещё не быть.'''
+    geometry, options = POST_THUMBNAILS[alias]
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, _options(source, options))
+    return ImageFile(name, default.storage)
+
+
+def ready(image, alias):
+    '''Готовая миниатюра из KV-хранилища sorl или None; ничего не создаёт.'''
+    return default.kvstore.get(thumbnail_file(image, alias))
+
+
+def prefetch(posts):
+    '''Ищет миниатюры всех постов одним get_many KV-хранилища.
+
+    Результат кладётся в image.prefetched_thumbnails, и тег
+    post_thumbnail больше не обращается к хранилищу по одной.
+    '''
+    wanted = [
+        (post.image, alias)
+        for post in posts if post.image
+        for alias in POST_THUMBNAILS
+    ]
+    if not wanted:
+        return
+    found = default.kvstore.get_many(
+        [thumbnail_file(image, alias) for image, alias in wanted])
+    for (image, alias), thumbnail in zip(wanted, found):
+        if not hasattr(image, 'prefetched_thumbnails'):
+            image.prefetched_thumbnails = {}
+        image.prefetched_thumbnails[alias] = thumbnail
+
+
+def source_exists(image):
+    try:
+        return image.storage.exists(image.name)
+    except SuspiciousFileOperation:
+        # Путь вне MEDIA_ROOT: такой файл не обрабатываем.
+        return False
+
+
+def generate(image):
+    '''Создаёт миниатюры всех размеров из POST_THUMBNAILS для image.
+
+    Возвращает число созданных размеров; уже готовые не пересоздаются.
+    Нужен сам FieldFile, а не имя: хранилище оригинала входит в ключ
+    миниатюры.
+    '''
+    if not source_exists(image):
+        logger.warning('Нет исходного файла %s для миниатюр', image.name)
+        return 0
+    created = 0
+    for alias, (geometry, options) in POST_THUMBNAILS.items():
+        if ready(image, alias) is None:
+            default.backend.get_thumbnail(image, geometry, **options)
+            created += 1
+    return created
+
+
+def generate_for_post(post):
+    '''Миниатюры поста; страницы с ним перестроятся уже с картинками.'''
+    created = generate(post.image)
+    if created:
+        caching.post_changed(post)
+    return created
+
+
+def _run(post):
+    try:
+        generate_for_post(post)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', post.image.name)
+    finally:
+        with _lock:
+            _pending.discard(post.image.name)
+        # Соединения пула живут в его потоках, их закрываем сами.
+        connections.close_all()
+
+
+def executor():
+    global _executor, _executor_pid
+    with _lock:
+        # Потоки пула не переживают fork воркера.
+        if _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                THUMBNAIL_WORKERS, thread_name_prefix='thumbnails')
+            _executor_pid = os.getpid()
+            _pending.clear()
+        return _executor
+
+
+def schedule(post):
+    '''Ставит генерацию миниатюр поста в пул после коммита транзакции.
+
+    По готовности сдвигаются поколения страниц с постом, и они
+    перестраиваются уже с миниатюрами вместо заглушек.
+    '''
+    name = post.image.name
+    if not name:
+        return
+
+    def submit():
+        pool = executor()
+        with _lock:
+            if name in _pending:
+                return
+            _pending.add(name)
+        pool.submit(_run, post)
+    transaction.on_commit(submit)
+
+
+def thumbnail_or_placeholder(image, alias):
+    '''Готовая миниатюра или заглушка; в запросе картинки не строятся.
+
+    Для заглушки у image выставляется thumbnail_pending, чтобы разметку
+    с ней не кэшировали; ставить генерацию — дело вызывающего.
+    '''
+    prefetched = getattr(image, 'prefetched_thumbnails', {})
+    if alias in prefetched:
+        thumbnail = prefetched[alias]
+    else:
+        thumbnail = ready(image, alias)
+    if thumbnail is not None:
+        return thumbnail
+    image.thumbnail_pending = True
+    return Placeholder(POST_THUMBNAILS[alias][0])
@@ -5,14 +5,28 @@ from . import views
 app_name = 'group_posts'
 urlpatterns = [
     path('', views.index, name='index'),
+    path('rss/', views.index_feed, {'kind': 'rss'}, name='index_rss'),
+    path('atom/', views.index_feed, {'kind': 'atom'}, name='index_atom'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('group/<slug:slug>/rss/', views.group_feed, {'kind': 'rss'},
+         name='group_rss'),
+    path('group/<slug:slug>/atom/', views.group_feed, {'kind': 'atom'},
+         name='group_atom'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/rss/', views.profile_feed,
+         {'kind': 'rss'}, name='profile_rss'),
+    path('profile/<str:username>/atom/', views.profile_feed,
+         {'kind': 'atom'}, name='profile_atom'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
+    path('search/', views.post_search, name='search'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('export/', views.export_data, name='export'),
     path('profile/<str:username>/follow/',
          views.profile_follow,
          name='profile_follow'),
@@ -3,25 +3,50 @@ from typing import Any
 
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from . import export, ingestion
+from .caching import (cache_page_by, condition_by, feed_scopes, group_scopes,
+                      index_scopes, page_state, post_scopes, profile_scopes)
+from .counters import stats_for
+from .feed import (FeedPaginator, NumberedFeedPaginator, extend,
+                   feed_paginator, feed_posts)
+from .feeds import FEEDS
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
-from yatube.settings import TEN_POST_PAGE, ONE_SECOND, TWENTY_SECOND
+from .paginators import (COMMENT_ORDERING, CURSOR_PARAM, POST_ORDERING,
+                         CursorPaginator)
+from .search import SEARCH_PARAM, engine as search_engine
+from yatube.settings import COMMENTS_PAGE, PAGE_CACHE_TIMEOUT, TEN_POST_PAGE
 
+# Accept, которым скрипт просит фрагмент разметки вместо страницы.
+FRAGMENT_CONTENT_TYPE = 'text/html;fragment'
 
-def paginator(request: Any, query_set: Any):
+
+def paginator(request: Any, query_set: Any, ordering=POST_ORDERING):
+    if CURSOR_PARAM in request.GET:
+        cursor_paginator = CursorPaginator(query_set, TEN_POST_PAGE,
+                                           ordering)
+        return cursor_paginator.get_page(request.GET.get(CURSOR_PARAM))
     paginator = Paginator(query_set, TEN_POST_PAGE)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
 
 
-@cache_page(TWENTY_SECOND * ONE_SECOND)
+def comments_page(post, cursor=None):
+    '''Страница комментариев поста, от свежих; авторы — тем же запросом.'''
+    comments = CursorPaginator(post.comments.select_related('author'),
+                               COMMENTS_PAGE, COMMENT_ORDERING)
+    return comments.get_page(cursor)
+
+
+@cache_page_by(PAGE_CACHE_TIMEOUT, index_scopes)
 def index(request):
     '''Функия главной страницы.'''
     title = 'Последние обновления на сайте'
-    post_list = Post.objects.order_by('-pub_date')
+    post_list = Post.objects.select_related(
+        'author', 'group').order_by(*POST_ORDERING)
     page_obj = paginator(request, post_list)
     context = {
         'title': title,
@@ -30,11 +55,14 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@condition_by(group_scopes)
+@cache_page_by(PAGE_CACHE_TIMEOUT, group_scopes)
 def group_posts(request, slug):
     '''Фунция вызова страницы с постами групп.'''
     title = 'Записи сообщества:'
     group = get_object_or_404(Group, slug=slug)
-    group_list = group.posts.order_by('-pub_date')
+    group_list = group.posts.select_related(
+        'author', 'group').order_by(*POST_ORDERING)
     page_obj = paginator(request, group_list)
     context = {
         'page_obj': page_obj,
@@ -44,11 +72,15 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@condition_by(profile_scopes)
+@cache_page_by(PAGE_CACHE_TIMEOUT, profile_scopes)
 def profile(request, username):
     '''Профайл пользователя.'''
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.order_by('-pub_date')
-    count_posts = posts.count()
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    posts = author.posts.select_related(
+        'author', 'group').order_by(*POST_ORDERING)
+    count_posts = stats_for(author).posts_count
     title = 'Все посты пользователя:'
     following = (request.user.is_authenticated
                  and request.user != author
@@ -66,11 +98,14 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@condition_by(post_scopes)
+@cache_page_by(PAGE_CACHE_TIMEOUT, post_scopes)
 def post_detail(request, post_id):
     title = 'Пост'
-    post = get_object_or_404(Post, pk=post_id)
-    post_count = post.author.posts.count()
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
+    post_count = stats_for(post.author).posts_count
+    comments = comments_page(post)
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
@@ -82,6 +117,59 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@condition_by(post_scopes)
+@cache_page_by(PAGE_CACHE_TIMEOUT, post_scopes)
+def post_comments(request, post_id):
+    '''Фрагмент со следующей страницей комментариев для «Показать ещё».
+
+    Существование поста уже проверил post_scopes: его ответ запомнен
+    на запросе, так что сам пост не загружается.
+    '''
+    if page_state(request, post_scopes, {'post_id': post_id}) is None:
+        raise Http404
+    post = Post(pk=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(post, request.GET.get(CURSOR_PARAM)),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@condition_by(feed_scopes(index_scopes), per_user=False)
+@cache_page_by(PAGE_CACHE_TIMEOUT, feed_scopes(index_scopes), per_user=False)
+def index_feed(request, kind):
+    '''RSS или Atom главной: одна копия для всех, 304 по ETag.'''
+    return FEEDS['index', kind](request)
+
+
+@condition_by(feed_scopes(group_scopes), per_user=False)
+@cache_page_by(PAGE_CACHE_TIMEOUT, feed_scopes(group_scopes), per_user=False)
+def group_feed(request, kind, slug):
+    return FEEDS['group', kind](request, slug=slug)
+
+
+@condition_by(feed_scopes(profile_scopes), per_user=False)
+@cache_page_by(PAGE_CACHE_TIMEOUT, feed_scopes(profile_scopes),
+               per_user=False)
+def profile_feed(request, kind, username):
+    return FEEDS['profile', kind](request, username=username)
+
+
+def post_search(request):
+    '''Полнотекстовый поиск по постам.'''
+    query = request.GET.get(SEARCH_PARAM, '').strip()
+    results = search_engine().paginator(query, TEN_POST_PAGE)
+    page_obj = None
+    if results is not None:
+        page_obj = results.get_page(request.GET.get(CURSOR_PARAM))
+    context = {
+        'title': 'Поиск',
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -89,6 +177,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        ingestion.schedule(post)
         return redirect("group_posts:profile", username=post.author)
     return render(request, "posts/create_post.html", {"form": form})
 
@@ -96,7 +185,7 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.id:
         return redirect('group_posts:post_detail', post_id)
     form = PostForm(
         request.POST or None,
@@ -107,6 +196,8 @@ def post_edit(request, post_id):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if 'image' in form.changed_data:
+            ingestion.schedule(post)
         return redirect("group_posts:post_detail", post_id=post_id)
     context = {
         'form': form,
@@ -116,24 +207,60 @@ def post_edit(request, post_id):
     return render(request, "posts/create_post.html", context)
 
 
+def wants_fragment(request):
+    '''Запрос из скрипта страницы: ответ — фрагмент, а не редирект.'''
+    return (request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+            or request.headers.get('Accept', '').startswith(
+                FRAGMENT_CONTENT_TYPE))
+
+
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    '''Добавляет комментарий.
+
+    Обычная форма получает редирект на пост. Запрос из скрипта —
+    только новый комментарий (201) или ошибки формы (400): страница
+    поста не перестраивается, а сигнал сдвигает лишь поколение поста.
+    '''
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
         comment.save()
+        if wants_fragment(request):
+            return render(request, 'posts/includes/comment.html',
+                          {'comment': comment}, status=201)
+    elif wants_fragment(request):
+        return render(request, 'posts/includes/comment_errors.html',
+                      {'form': form}, status=400)
     return redirect('group_posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    user = request.user
-    authors = user.follower.all().values('author')
-    posts_list = Post.objects.filter(author__in=authors)
-    page_obj = paginator(request, posts_list)
+    merged = feed_paginator(request.user, TEN_POST_PAGE)
+    if merged is not None:
+        page_obj = merged.get_page(request.GET.get(CURSOR_PARAM))
+    elif CURSOR_PARAM in request.GET:
+        page_obj = FeedPaginator(
+            feed_posts(request.user), TEN_POST_PAGE, request.user.pk,
+        ).get_page(request.GET.get(CURSOR_PARAM))
+    else:
+        posts_list = feed_posts(request.user)
+        page_number = request.GET.get('page')
+        page_obj = NumberedFeedPaginator(
+            posts_list, TEN_POST_PAGE, request.user.pk).get_page(page_number)
+        # Последняя страница: старые посты могли не попасть в ленту.
+        while not page_obj.has_next():
+            last = page_obj[-1] if page_obj else None
+            before = last and (last.feed_pub_date, last.feed_post_id)
+            if not extend(request.user.pk, before):
+                break
+            page_obj = NumberedFeedPaginator(
+                posts_list, TEN_POST_PAGE,
+                request.user.pk).get_page(page_number)
     context = {'page_obj': page_obj}
     return render(
         request,
@@ -155,6 +282,20 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    if Follow.objects.filter(author=author, user=request.user).exists():
-        Follow.objects.get(author=author, user=request.user).delete()
+    Follow.objects.filter(author=author, user=request.user).delete()
     return redirect('group_posts:profile', author)
+
+
+@login_required
+def export_data(request):
+    '''Выгрузка своих постов и комментариев потоком, без сборки в памяти.'''
+    format = request.GET.get('format', export.NDJSON)
+    if format not in export.FORMATS:
+        format = export.NDJSON
+    compress = request.GET.get('gzip') == '1'
+    response = StreamingHttpResponse(
+        export.stream(export.user_records(request.user), format, compress),
+        content_type=export.content_type(format, compress))
+    response['Content-Disposition'] = 'attachment; filename="%s"' % (
+        export.filename(request.user.username, format, compress))
+    return response
@@ -0,0 +1,69 @@
+// «Показать ещё»: следующая страница комментариев подгружается
+// фрагментом и встаёт на место кнопки вместе со своей кнопкой.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('[data-load-comments]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  link.classList.add('disabled');
+  fetch(link.href, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      link.insertAdjacentHTML('beforebegin', html);
+      link.remove();
+    })
+    .catch(function () {
+      link.classList.remove('disabled');
+    });
+});
+
+// Комментарий отправляется без перезагрузки: сервер возвращает
+// только его разметку (201) или ошибки формы (400). При любом
+// другом ответе форма уходит обычным способом.
+document.addEventListener('submit', function (event) {
+  var form = event.target.closest('[data-comment-form]');
+  if (!form) {
+    return;
+  }
+  event.preventDefault();
+  var button = form.querySelector('[type=submit]');
+  var errors = form.querySelector('[data-comment-errors]');
+  button.disabled = true;
+  fetch(form.action, {
+    method: 'POST',
+    body: new FormData(form),
+    credentials: 'same-origin',
+    headers: {'X-Requested-With': 'XMLHttpRequest'}
+  })
+    .then(function (response) {
+      if (response.status !== 201 && response.status !== 400) {
+        throw new Error(response.status);
+      }
+      return response.text().then(function (html) {
+        if (response.status === 400) {
+          errors.innerHTML = html;
+          return;
+        }
+        errors.innerHTML = '';
+        document.getElementById('comments')
+          .insertAdjacentHTML('afterbegin', html);
+        var count = document.querySelector('[data-comments-count]');
+        if (count) {
+          count.textContent = Number(count.textContent) + 1;
+        }
+        form.reset();
+      });
+    })
+    .catch(function () {
+      form.submit();
+    })
+    .then(function () {
+      button.disabled = false;
+    });
+});
@@ -1,4 +1,5 @@
 import os
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -23,6 +24,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
@@ -33,6 +35,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,8 +67,38 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Копия default, которую наполняет репликация (например, Litestream
+    # или LiteFS). В тестах это отдельная база: миграции на неё не идут,
+    # и тесты сами копируют в неё default, когда «реплика догнала».
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+    },
 }
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+# Алиасы, с которых читают GET-запросы REPLICA_READ_VIEWS; пусто — все
+# чтения идут в default. После записи сессия REPLICA_PIN_SECONDS читает
+# из default, чтобы видеть свои изменения, а страницы, собранные с
+# реплики, кэшируются не дольше REPLICA_CACHE_TIMEOUT — на время лага.
+DATABASE_REPLICAS = ()
+REPLICA_READ_VIEWS = (
+    'group_posts:index',
+    'group_posts:group_list',
+    'group_posts:profile',
+    'group_posts:post_detail',
+    'group_posts:post_comments',
+    'group_posts:search',
+    'group_posts:index_rss',
+    'group_posts:index_atom',
+    'group_posts:group_rss',
+    'group_posts:group_atom',
+    'group_posts:profile_rss',
+    'group_posts:profile_atom',
+    'api:*',
+)
+REPLICA_PIN_SECONDS = 10
+REPLICA_CACHE_TIMEOUT = 60
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -106,11 +139,32 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Каталоги MEDIA_ROOT, доступные по MEDIA_URL.
+MEDIA_PUBLIC_DIRS = ('posts', 'cache')
+# None — файлы отдаёт приложение; 'x-accel-redirect' (nginx) или
+# 'x-sendfile' (Apache, lighttpd) — передачу берёт на себя прокси.
+# Для nginx MEDIA_ACCEL_PREFIX — internal-location с alias на MEDIA_ROOT.
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/internal-media/'
+# Загрузки сразу пишутся во временный файл, а не копятся в памяти.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+# Тесты зовут cache.clear(): с общим файлом они стирали бы кэш сайта,
+# работающего на том же узле. Как и у тестовой БД, у них свой файл.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    CACHES['default']['LOCATION'] = os.path.join(BASE_DIR,
+                                                 'test_cache.sqlite3')
 
 ERROR_FOUR_HUNDRED_AND_FOUR = 404
 THE_ANSWER_IS_TWO_HUNDRED = 200
@@ -119,8 +173,49 @@ COUNT_ONE = 1
 FIRST_POST = 0
 ONE_POST = 1
 TEN_POST_PAGE = 10
+COMMENTS_PAGE = 20
+FEED_ITEMS = 20
+API_PAGE_SIZE = 20
 THREE_POST_PAGE = 3
 THIRTEEN_POSTS = 13
 TWO_HUNDRED_CHARACTERS = 200
 ONE_SECOND = 1
 TWENTY_SECOND = 20
+PAGE_CACHE_TIMEOUT = 6 * 60 * 60
+CARD_CACHE_TIMEOUT = 24 * 60 * 60
+FEED_BACKFILL_POSTS = 200
+FEED_BATCH_SIZE = 500
+# Сколько помнить, что ниже конца ленты дописывать нечего; метку
+# сбрасывают подписка и возврат автора под порог.
+FEED_COMPLETE_TIMEOUT = 24 * 60 * 60
+IMPORT_BATCH_SIZE = 2000
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BLOCK_SIZE = 64 * 1024
+# push — материализованная лента, pull — слияние потоков авторов,
+# hybrid — push для всех, кроме авторов с числом подписчиков сверх порога.
+FEED_MODE = 'hybrid'
+FEED_PUSH_FOLLOWER_LIMIT = 10000
+FEED_CELEBRITY_CACHE_TIMEOUT = 300
+# Размеры миниатюр постов: имя -> (геометрия, опции sorl). Все они
+# создаются в пуле после сохранения поста, в запросе не строятся.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_PLACEHOLDER = 'img/thumbnail-placeholder.svg'
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_LRU_SIZE = 10000
+THUMBNAIL_LRU_TIMEOUT = 5 * 60
+# Оригиналы уменьшаются до IMAGE_MAX_SIDE по большей стороне, для srcset
+# пишутся варианты этих ширин; webp — если его умеет Pillow.
+IMAGE_MAX_SIDE = 2048
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_VARIANT_FORMATS = ('webp', 'jpg')
+IMAGE_QUALITY = 85
+IMAGE_WORKERS = 2
+# Сборка осиротевших картинок: файлы моложе GC_MEDIA_GRACE не трогаются,
+# точка продолжения обхода сохраняется в GC_MEDIA_CHECKPOINT.
+GC_MEDIA_BATCH_SIZE = 1000
+GC_MEDIA_RATE = 50
+GC_MEDIA_GRACE = 24 * 60 * 60
+GC_MEDIA_CHECKPOINT = os.path.join(BASE_DIR, 'gc_media.checkpoint')